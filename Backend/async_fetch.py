@@ -0,0 +1,218 @@
+import os
+import time
+import atexit
+import asyncio
+import threading
+from kubernetes.client.rest import ApiException
+from .k8s_fetch import (
+    loads, parse_list_page, group_by_namespace,
+    DEPLOYMENT_FETCH_MODE, DEPLOYMENT_LIST_LIMIT, DEPLOYMENT_LIST_FORMAT, TABLE_ACCEPT
+)
+from .credentials import credential_provider, is_auth_failure
+from .informer import DEPLOYMENT_INFORMER
+from .metrics import count_api_call, start_api_count, observe_cluster_fetch, record_fetch_error
+from .request_timing import phase
+from . import recording
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# "threads" fetches cache misses cluster by cluster on the fan_out pool,
+# "asyncio" lists every missing cluster at once from a single event loop
+# over pooled keep-alive connections
+CLUSTER_FETCH_ENGINE = os.getenv("CLUSTER_FETCH_ENGINE", "threads").lower()
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "200"))
+ASYNC_CONNECTIONS_PER_HOST = int(os.getenv("ASYNC_CONNECTIONS_PER_HOST", "4"))
+ASYNC_REQUEST_TIMEOUT = float(os.getenv("ASYNC_REQUEST_TIMEOUT", "30"))
+
+if CLUSTER_FETCH_ENGINE == "asyncio" and aiohttp is None:
+    print("CLUSTER_FETCH_ENGINE=asyncio needs aiohttp; falling back to threads")
+
+def async_engine_enabled():
+    # The informer already keeps deployments in memory, nothing to collect
+    return CLUSTER_FETCH_ENGINE == "asyncio" and aiohttp is not None and not DEPLOYMENT_INFORMER
+
+class AsyncCollector:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loop = None
+        self.session = None
+
+    def get_loop(self):
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="cluster-collector", daemon=True).start()
+                self.loop = loop
+            return self.loop
+
+    def get_session(self):
+        # Only touched from the loop thread; one connector pools the
+        # connections to every API server
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=ASYNC_MAX_CONNECTIONS,
+                    limit_per_host=ASYNC_CONNECTIONS_PER_HOST,
+                    ssl=False
+                ),
+                timeout=aiohttp.ClientTimeout(total=ASYNC_REQUEST_TIMEOUT)
+            )
+        return self.session
+
+    async def get(self, endpoint, token, path, params, accept="application/json"):
+        count_api_call()
+        if recording.player:
+            return await recording.player.serve_async(endpoint, path, params, accept)
+
+        started = time.perf_counter()
+        async with self.get_session().get(
+            endpoint.rstrip("/") + path,
+            params=params,
+            headers={"Authorization": f"Bearer {token}", "Accept": accept}
+        ) as response:
+            body = await response.read()
+            if recording.recorder:
+                recording.recorder.record_k8s(
+                    endpoint, path, params, accept, response.status, response.reason, body,
+                    response.headers.get("Content-Type"), time.perf_counter() - started
+                )
+            if response.status >= 400:
+                raise ApiException(status=response.status, reason=response.reason)
+            return body
+
+    async def list_deployments(self, endpoint, token, namespace, init_containers):
+        path = "/apis/apps/v1/deployments" if namespace is None else f"/apis/apps/v1/namespaces/{namespace}/deployments"
+        table = DEPLOYMENT_LIST_FORMAT == "table" and not init_containers
+
+        items = []
+        continue_token = None
+        while True:
+            params = {"includeObject": "Metadata"} if table else {}
+            if DEPLOYMENT_LIST_LIMIT > 0:
+                params["limit"] = str(DEPLOYMENT_LIST_LIMIT)
+            if continue_token:
+                params["continue"] = continue_token
+
+            body = await self.get(endpoint, token, path, params, TABLE_ACCEPT if table else "application/json")
+            deployments, continue_token, _ = parse_list_page(body)
+            items.extend(deployments)
+
+            if not continue_token:
+                return items
+
+    async def list_deployments_by_namespace(self, endpoint, token, init_containers):
+        if DEPLOYMENT_FETCH_MODE == "namespaced":
+            namespaces = loads(await self.get(endpoint, token, "/api/v1/namespaces", {}))
+            names = [item["metadata"]["name"] for item in namespaces.get("items") or []]
+            deployments = await asyncio.gather(*(
+                self.list_deployments(endpoint, token, name, init_containers) for name in names
+            ))
+            return list(zip(names, deployments))
+
+        return group_by_namespace(await self.list_deployments(endpoint, token, None, init_containers))
+
+    async def measure(self, key, coroutine, observe):
+        # Each cluster runs in its own task, so its API call count is its own
+        counter, _ = start_api_count()
+        started = time.perf_counter()
+        try:
+            return await coroutine
+        finally:
+            if observe:
+                observe(key, time.perf_counter() - started, counter[0])
+
+    async def collect_async(self, targets, init_containers, timeout, observe):
+        outcomes = await asyncio.gather(
+            *(
+                asyncio.wait_for(
+                    self.measure(key, self.list_deployments_by_namespace(endpoint, token, init_containers), observe),
+                    timeout
+                )
+                for key, (endpoint, token) in targets.items()
+            ),
+            return_exceptions=True
+        )
+        return dict(zip(targets.keys(), outcomes))
+
+    def collect(self, targets, init_containers=True, timeout=None, observe=None):
+        # Blocking entry point for the Flask routes. targets maps any key to
+        # (endpoint, token); each key gets [(namespace, [deployments])] or
+        # the exception its cluster raised, TimeoutError past the timeout.
+        # observe(key, seconds, api_calls) is called as each cluster finishes
+        if not targets:
+            return {}
+        future = asyncio.run_coroutine_threadsafe(
+            self.collect_async(targets, init_containers, timeout, observe), self.get_loop()
+        )
+        return future.result()
+
+    def close(self):
+        with self.lock:
+            loop, session = self.loop, self.session
+        if loop is None or session is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=5)
+        except Exception as e:
+            print(f"Failed to close cluster collector session: {e}")
+
+collector = AsyncCollector()
+atexit.register(collector.close)
+
+def prefetch_clusters(cache, pairs, build, init_containers=True, timeout=None):
+    # Fills the cache misses among (env, cluster) pairs with one batch of
+    # concurrent list requests; the routes then read the cache as before.
+    # Failed clusters keep their previous entry and are returned as
+    # {(env, cluster): exception}. Clusters without usable credentials are
+    # left to the regular path, which reports the real error
+    if not async_engine_enabled():
+        return {}
+
+    current_time = time.time()
+    missing = [(env, cluster_name) for env, cluster_name in pairs if cache.needs_fetch(env, cluster_name, current_time)]
+    if not missing:
+        return {}
+
+    credentials = credential_provider.get_many(sorted({cluster_name for _, cluster_name in missing}))
+    targets = {}
+    for env, cluster_name in missing:
+        cluster_creds = credentials.get(cluster_name)
+        if cluster_creds and cluster_creds['token'] and cluster_creds['endpoint'].startswith('https://'):
+            targets[(env, cluster_name)] = (cluster_creds['endpoint'], cluster_creds['token'])
+
+    # Clusters another request is already fetching are left to the regular
+    # path, which waits for that fetch instead of starting its own
+    flights = {}
+    for key in list(targets):
+        flight = cache.flights.claim(key)
+        if flight is None:
+            del targets[key]
+        else:
+            flights[key] = flight
+
+    failures = {}
+    outcomes = {}
+    try:
+        with phase("deployments"):
+            outcomes = collector.collect(
+                targets, init_containers, timeout,
+                lambda key, seconds, api_calls: observe_cluster_fetch(cache.name, key[0], key[1], seconds, api_calls)
+            )
+        for (env, cluster_name), outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                record_fetch_error(cache.name, cluster_name, outcome)
+                if is_auth_failure(outcome):
+                    credential_provider.invalidate(cluster_name)
+                failures[(env, cluster_name)] = outcome
+                cache.flights.complete((env, cluster_name), flights.pop((env, cluster_name)), error=outcome)
+            else:
+                entry = cache.put(env, cluster_name, build(env, cluster_name, outcome, current_time), current_time)
+                cache.flights.complete((env, cluster_name), flights.pop((env, cluster_name)), result=entry)
+    finally:
+        for key, flight in flights.items():
+            cache.flights.complete(key, flight, error=RuntimeError(f"Prefetch of {key[1]} did not finish"))
+
+    return failures
@@ -0,0 +1,97 @@
+import os
+import threading
+import urllib3
+from kubernetes import client
+from .credentials import credential_provider, is_auth_failure
+from .request_timing import phase
+from . import recording
+
+# One ApiClient per cluster for the life of the process, so requests reuse
+# keep-alive connections instead of paying a TLS handshake per cache miss
+K8S_POOL_MAXSIZE = int(os.getenv("K8S_POOL_MAXSIZE", "4"))
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def is_connection_failure(error):
+    return isinstance(error, urllib3.exceptions.HTTPError)
+
+class ClientRegistry:
+    def __init__(self, pool_maxsize=K8S_POOL_MAXSIZE):
+        self.pool_maxsize = pool_maxsize
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def build(self, cluster_creds):
+        configuration = client.Configuration()
+        configuration.host = cluster_creds['endpoint']
+        configuration.verify_ssl = False
+        configuration.api_key = {"authorization": f"Bearer {cluster_creds['token']}"}
+        configuration.connection_pool_maxsize = self.pool_maxsize
+
+        api_client = client.ApiClient(configuration)
+        recording.wrap_rest_client(cluster_creds['endpoint'], api_client.rest_client)
+        return {
+            "api_client": api_client,
+            "apps_v1": client.AppsV1Api(api_client),
+            "core_v1": client.CoreV1Api(api_client)
+        }
+
+    def get(self, cluster_name):
+        # Returns {"apps_v1", "core_v1"} for the cluster, or None when it has no
+        # usable endpoint; a client is rebuilt only when the credentials rotate
+        cluster_creds = credential_provider.get(cluster_name)
+        if not cluster_creds or not cluster_creds['token'] or not cluster_creds['endpoint'].startswith('https://'):
+            return None
+
+        credentials_key = (cluster_creds['endpoint'], cluster_creds['token'])
+        stale = None
+        with self.lock:
+            entry = self.entries.get(cluster_name)
+            if entry is not None and entry[0] == credentials_key:
+                return entry[1]
+
+            with phase("client"):
+                clients = self.build(cluster_creds)
+            stale = entry[1] if entry else None
+            self.entries[cluster_name] = (credentials_key, clients)
+
+        if stale:
+            self.close(stale)
+        return clients
+
+    def invalidate(self, cluster_name, error=None):
+        # Drops the cluster's client after a failure it cannot recover from by
+        # itself: rejected credentials or a broken connection
+        if error is not None and not (is_auth_failure(error) or is_connection_failure(error)):
+            return
+
+        with self.lock:
+            entry = self.entries.pop(cluster_name, None)
+        if entry:
+            self.close(entry[1])
+        if error is None or is_auth_failure(error):
+            credential_provider.invalidate(cluster_name)
+
+    def close(self, clients):
+        # ApiClient.close() only shuts down its async_req thread pool; the
+        # sockets live in the REST client's pool manager, whose clear() drops
+        # its pools without closing them. Connections still in use by a
+        # request are discarded when that request returns them
+        try:
+            clients["api_client"].close()
+            pool_manager = clients["api_client"].rest_client.pool_manager
+            for key in list(pool_manager.pools.keys()):
+                pool = pool_manager.pools.get(key)
+                if pool is not None:
+                    pool.close()
+            pool_manager.clear()
+        except Exception as e:
+            print(f"Failed to close Kubernetes client: {e}")
+
+    def close_all(self):
+        with self.lock:
+            entries, self.entries = self.entries, {}
+        for _, clients in entries.values():
+            self.close(clients)
+
+client_registry = ClientRegistry()
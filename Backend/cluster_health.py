@@ -0,0 +1,178 @@
+import os
+import time
+import threading
+from .fanout import fan_out_with_deadline
+from .request_timing import phase
+
+# A request waits at most REQUEST_TIME_BUDGET seconds for its clusters and
+# answers with whatever finished; clusters failing CIRCUIT_FAILURE_THRESHOLD
+# times in a row are skipped for CIRCUIT_RESET_SECONDS, then probed again
+REQUEST_TIME_BUDGET = float(os.getenv("REQUEST_TIME_BUDGET", "25"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "60"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+class CircuitBreakers:
+    def __init__(self, threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.circuits = {}
+
+    def allow(self, cluster_name, current_time=None):
+        if current_time is None:
+            current_time = time.time()
+
+        with self.lock:
+            circuit = self.circuits.get(cluster_name)
+            if circuit is None or circuit["state"] == CLOSED:
+                return True
+
+            # One request at a time probes an open circuit once it has cooled down
+            if circuit["state"] == OPEN and current_time - circuit["opened_at"] >= self.reset_seconds:
+                circuit["state"] = HALF_OPEN
+                circuit["probe_started_at"] = current_time
+                return True
+
+            # A probe that never reported back does not hold the circuit forever
+            if circuit["state"] == HALF_OPEN and current_time - circuit["probe_started_at"] >= self.reset_seconds:
+                circuit["probe_started_at"] = current_time
+                return True
+
+            return False
+
+    def record_success(self, cluster_name):
+        with self.lock:
+            self.circuits.pop(cluster_name, None)
+
+    def record_failure(self, cluster_name, error=None):
+        current_time = time.time()
+        with self.lock:
+            circuit = self.circuits.setdefault(cluster_name, {
+                "state": CLOSED, "failures": 0, "opened_at": 0, "probe_started_at": 0, "error": None
+            })
+            circuit["failures"] += 1
+            circuit["error"] = error
+            if circuit["state"] == HALF_OPEN or circuit["failures"] >= self.threshold:
+                circuit["state"] = OPEN
+                circuit["opened_at"] = current_time
+
+    def reset(self, cluster_names=None):
+        with self.lock:
+            if cluster_names is None:
+                self.circuits.clear()
+            else:
+                for cluster_name in cluster_names:
+                    self.circuits.pop(cluster_name, None)
+
+    def describe(self, cluster_name):
+        with self.lock:
+            circuit = self.circuits.get(cluster_name)
+            return dict(circuit) if circuit else {"state": CLOSED, "failures": 0}
+
+circuit_breakers = CircuitBreakers()
+
+def status_key(env, cluster_name):
+    # The same cluster can belong to several environments, each with its own entry
+    return f"{env}/{cluster_name}"
+
+def capture(fetch):
+    # Exceptions become values so one failing cluster does not end a fan-out
+    def wrapper(key):
+        try:
+            return key, fetch(key)
+        except Exception as e:
+            return key, e
+    return wrapper
+
+class ClusterCollection:
+    # Tracks the (env, cluster) keys of one request against its time budget.
+    # failure(result) returns an error message for results that are cached
+    # failures; resolve() turns each key's outcome into what gets served
+    # and its entry in the per-cluster status block, keyed env/cluster
+    def __init__(self, cache, keys, failure=None, budget=None):
+        self.cache = cache
+        self.keys = list(keys)
+        self.failure = failure
+        self.budget = REQUEST_TIME_BUDGET if budget is None else budget
+        self.started = time.time()
+        self.outcomes = {}
+        self.statuses = {}
+
+        for key in self.keys:
+            if not circuit_breakers.allow(key[1], self.started):
+                self.outcomes[key] = ("skipped", circuit_breakers.describe(key[1]).get("error"))
+
+    def allowed(self):
+        return [key for key in self.keys if key not in self.outcomes]
+
+    def remaining(self):
+        return max(0.0, self.budget - (time.time() - self.started))
+
+    def prefetch(self, prefetch):
+        # prefetch(keys, timeout) returns {key: exception} for clusters it could not list
+        allowed = self.allowed()
+        if not allowed:
+            return
+        for key, error in prefetch(allowed, self.remaining()).items():
+            self.record(key, error)
+
+    def record(self, key, value):
+        if isinstance(value, Exception):
+            self.outcomes[key] = ("timeout" if isinstance(value, TimeoutError) else "error", str(value) or type(value).__name__)
+        else:
+            self.outcomes[key] = ("done", value)
+
+    def resolve(self, key):
+        env, cluster_name = key
+        name = status_key(env, cluster_name)
+        state, value = self.outcomes.get(key) or ("timeout", f"No response within {self.budget:g}s")
+        entry = self.cache.get_entry(env, cluster_name)
+        fresh = entry is None or entry.fetched_at >= self.started
+
+        if state == "done":
+            result, version = value
+            message = self.failure(result) if self.failure else None
+            if message is not None:
+                if fresh:
+                    circuit_breakers.record_failure(cluster_name, message)
+                self.statuses[name] = {"status": "error", "message": message}
+                return result, version
+
+            if fresh:
+                circuit_breakers.record_success(cluster_name)
+                self.statuses[name] = {"status": "ok"}
+            else:
+                self.statuses[name] = {"status": "cached", "age": int(self.started - entry.fetched_at)}
+            return result, version
+
+        if state != "skipped":
+            circuit_breakers.record_failure(cluster_name, value)
+
+        # Whatever the cluster last returned is still better than nothing
+        status = {"status": state, "message": value}
+        served = None
+        if entry is not None and (self.failure is None or self.failure(entry.result) is None):
+            status["served_from_cache"] = True
+            status["age"] = int(self.started - entry.fetched_at)
+            served = (entry.result, entry.version)
+        self.statuses[name] = status
+        return served
+
+def collect_clusters(cache, keys, fetch, failure=None, prefetch=None, budget=None):
+    # fetch(key) returns (result, version). Returns [(result, version)] in
+    # key order, None where nothing could be served, and the status block
+    collection = ClusterCollection(cache, keys, failure, budget)
+    with phase("collect"):
+        if prefetch:
+            collection.prefetch(prefetch)
+
+        pending = collection.allowed()
+        for key, (finished, value) in zip(pending, fan_out_with_deadline(fetch, pending, collection.remaining())):
+            if finished:
+                collection.record(key, value)
+
+    return [collection.resolve(key) for key in collection.keys], collection.statuses
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import threading
+import boto3
+from kubernetes.client.rest import ApiException
+from .metrics import time_credential_lookup
+from .request_timing import phase
+from .single_flight import SingleFlight
+from . import recording
+
+CREDENTIALS_TTL = int(os.getenv("CREDENTIALS_TTL", "900"))
+CREDENTIALS_FAILURE_TTL = int(os.getenv("CREDENTIALS_FAILURE_TTL", "60"))
+
+# BatchGetSecretValue accepts at most 20 secret ids per call
+SECRETS_BATCH_SIZE = 20
+
+def decode_cluster_secret(secret_string):
+    secret = json.loads(secret_string)
+    return {
+        'endpoint': secret.get('cluster_api_endpoint', ''),
+        'token': secret.get('bearer_token', '')
+    }
+
+def is_auth_failure(error):
+    return isinstance(error, ApiException) and error.status in (401, 403)
+
+class CredentialProvider:
+    def __init__(self, ttl=CREDENTIALS_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.entries = {}
+        self.failures = {}
+        self.flights = SingleFlight()
+
+    def get_client(self, region_name=None):
+        region_name = region_name or os.getenv("AWS_DEFAULT_REGION")
+        with self.lock:
+            if region_name not in self.clients:
+                self.clients[region_name] = recording.secrets_client(
+                    lambda: boto3.session.Session().client(
+                        service_name='secretsmanager',
+                        region_name=region_name
+                    )
+                )
+            return self.clients[region_name]
+
+    def cached(self, secret_name, current_time=None):
+        if current_time is None:
+            current_time = time.time()
+        with self.lock:
+            entry = self.entries.get(secret_name)
+            if entry and entry[1] > current_time:
+                return entry[0]
+            return None
+
+    def store(self, secret_name, credentials):
+        with self.lock:
+            self.entries[secret_name] = (credentials, time.time() + self.ttl)
+            self.failures.pop(secret_name, None)
+
+    def get(self, secret_name):
+        credentials = self.cached(secret_name)
+        if credentials is not None:
+            return credentials
+
+        # Waits for a batch that is already looking the secret up; what the
+        # batch could not return is looked up on its own
+        credentials = self.flights.do(secret_name, lambda: self.lookup(secret_name))
+        return credentials if credentials is not None else self.lookup(secret_name)
+
+    def lookup(self, secret_name):
+        with time_credential_lookup("get"), phase("credentials"):
+            response = self.get_client().get_secret_value(SecretId=secret_name)
+        credentials = decode_cluster_secret(response['SecretString'])
+        self.store(secret_name, credentials)
+        return credentials
+
+    def missing(self, secret_names, current_time):
+        # Returns the cached credentials among secret_names and the names
+        # worth looking up; recent failures are not retried yet
+        found = {}
+        missing = []
+        with self.lock:
+            for secret_name in secret_names:
+                entry = self.entries.get(secret_name)
+                if entry and entry[1] > current_time:
+                    found[secret_name] = entry[0]
+                elif self.failures.get(secret_name, 0) <= current_time:
+                    missing.append(secret_name)
+        return found, missing
+
+    def claim(self, secret_names):
+        # Splits secret_names into {name: flight} this caller looks up and
+        # the names another caller is already looking up
+        claimed = {}
+        in_flight = []
+        for secret_name in secret_names:
+            flight = self.flights.claim(secret_name)
+            if flight is None:
+                in_flight.append(secret_name)
+            else:
+                claimed[secret_name] = flight
+        return claimed, in_flight
+
+    def fetch_claimed(self, claimed):
+        found = {}
+        names = list(claimed)
+        try:
+            for start in range(0, len(names), SECRETS_BATCH_SIZE):
+                found.update(self.fetch_batch(names[start:start + SECRETS_BATCH_SIZE]))
+        finally:
+            for secret_name, flight in claimed.items():
+                self.flights.complete(secret_name, flight, result=found.get(secret_name))
+        return found
+
+    def get_many(self, secret_names):
+        found, missing = self.missing(secret_names, time.time())
+        claimed, in_flight = self.claim(missing)
+        found.update(self.fetch_claimed(claimed))
+
+        # Secrets another caller was already looking up are waited for
+        # instead of being requested twice
+        for secret_name in in_flight:
+            try:
+                flight = self.flights.wait(secret_name)
+            except TimeoutError:
+                continue
+            if flight is not None and flight.error is None and flight.result is not None:
+                found[secret_name] = flight.result
+
+        return found
+
+    def prefetch(self, secret_names):
+        # Batch lookup of the missing secrets on a background thread, so a
+        # request can answer from cached clusters without waiting for
+        # Secrets Manager. The secrets are claimed before the thread starts,
+        # so fetches that do need one wait for the batch
+        _, missing = self.missing(secret_names, time.time())
+        claimed, _ = self.claim(missing)
+        if claimed:
+            threading.Thread(target=self.fetch_claimed, args=(claimed,), name="credentials-prefetch", daemon=True).start()
+
+    def fetch_batch(self, secret_names):
+        # Secrets the batch call cannot return are left out; get() retries
+        # them one by one and surfaces the real error to the caller
+        fetched = {}
+        try:
+            with time_credential_lookup("batch"), phase("credentials"):
+                response = self.get_client().batch_get_secret_value(SecretIdList=secret_names)
+            for secret_value in response.get('SecretValues', []):
+                if 'SecretString' not in secret_value:
+                    continue
+                credentials = decode_cluster_secret(secret_value['SecretString'])
+                self.store(secret_value['Name'], credentials)
+                fetched[secret_value['Name']] = credentials
+        except Exception as e:
+            print(f"Batch secret lookup failed, falling back to single lookups: {e}")
+
+        # Remember misses for a short while so repeated prefetches of a
+        # missing secret do not spend a Secrets Manager call each time
+        failed_until = time.time() + CREDENTIALS_FAILURE_TTL
+        with self.lock:
+            for secret_name in secret_names:
+                if secret_name not in fetched:
+                    self.failures[secret_name] = failed_until
+        return fetched
+
+    def invalidate(self, secret_name=None):
+        with self.lock:
+            if secret_name is None:
+                self.entries.clear()
+                self.failures.clear()
+            else:
+                self.entries.pop(secret_name, None)
+                self.failures.pop(secret_name, None)
+
+credential_provider = CredentialProvider()
@@ -0,0 +1,387 @@
+import os
+import json
+import hashlib
+import time
+import threading
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from .snapshot_store import create_snapshot_store
+from .warm_start import create_snapshot_persister, CACHE_SNAPSHOT_MAX_AGE
+from .single_flight import SingleFlight
+from .metrics import timed_fetch, observe_payload
+
+CACHE_STALE_WHILE_REVALIDATE = os.getenv("CACHE_STALE_WHILE_REVALIDATE", "false").lower() == "true"
+CACHE_MAX_STALENESS = int(os.getenv("CACHE_MAX_STALENESS", "3600"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_CACHE_DURATION = 300
+
+caches = {}
+shared_store = create_snapshot_store()
+snapshot_persister = create_snapshot_persister()
+
+def serialize(value):
+    try:
+        return json.dumps(value, separators=(",", ":"), sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        return None
+
+def measure(payload):
+    # Serialized length is a cheap, stable stand-in for the in-memory footprint,
+    # and its hash is a content version that every worker computes the same way
+    if payload is None:
+        return 0, None
+    encoded = payload.encode("utf-8")
+    return len(encoded), hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+class CacheEntry:
+    __slots__ = ("result", "fetched_at", "size", "version", "restored")
+
+    def __init__(self, result, fetched_at, restored=False, measured=None):
+        # measured is the (size, version) already known for result, e.g. read
+        # back with a snapshot; otherwise result is serialized once here
+        self.result = result
+        self.fetched_at = fetched_at
+        self.size, self.version = measured if measured else measure(serialize(result))
+        self.restored = restored
+
+class EnvironmentCache:
+    def __init__(self, name, durations, maxsize=256, max_bytes=CACHE_MAX_BYTES, display_time=None, store=None,
+                 persist_if=None, failure=None):
+        self.name = name
+        self.persist_if = persist_if
+        # failure(result) returns a message for results that report a failed
+        # fetch; those never replace the entry already cached
+        self.failure = failure
+        self.store = store if store is not None else shared_store
+        self.durations = durations
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.display_time = display_time
+        self.entries = OrderedDict()
+        self.env_keys = defaultdict(set)
+        self.last_access_time = defaultdict(float)
+        self.last_requested = defaultdict(float)
+        self.cache_times = defaultdict(dict)
+        self.total_bytes = 0
+        self.counters = defaultdict(lambda: {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0})
+        self.flights = SingleFlight()
+        self.listeners = []
+        self.lock = threading.RLock()
+        caches[name] = self
+
+    def add_listener(self, listener):
+        # listener(env, cluster_name, entry, fetched) runs after every put,
+        # whatever filled it: a request, a background refresh, another
+        # worker's snapshot or a restored one (the last two with fetched=False)
+        self.listeners.append(listener)
+
+    def notify(self, env, cluster_name, entry, fetched):
+        for listener in self.listeners:
+            try:
+                listener(env, cluster_name, entry, fetched)
+            except Exception as e:
+                print(f"Cache listener failed for {cluster_name}: {e}")
+
+    def get_duration(self, env):
+        return self.durations.get(env, DEFAULT_CACHE_DURATION)
+
+    def get_cache_timestamp(self, env, current_time=None):
+        # Start of the env's current cache interval; a new interval begins on
+        # the first access after the previous one ran out
+        if current_time is None:
+            current_time = time.time()
+
+        with self.lock:
+            last_access_time = self.last_access_time[env]
+            if last_access_time and current_time - last_access_time < self.get_duration(env):
+                return last_access_time
+
+            if not self.store:
+                self.last_access_time[env] = current_time
+                if self.display_time:
+                    self.set_display_time(env, self.display_time())
+                return current_time
+
+        # The shared interval is read outside the lock; concurrent callers
+        # all get the same row back from the store
+        started_at, display_time = self.store.interval(
+            self.name, env, current_time, self.get_duration(env), self.display_time
+        )
+        with self.lock:
+            if started_at >= self.last_access_time[env]:
+                self.last_access_time[env] = started_at
+                self.cache_times[env]['display_time'] = display_time
+            return self.last_access_time[env]
+
+    def begin_interval(self, env, started_at, fetched):
+        # Starts a new interval for env at started_at holding fetched, a
+        # {cluster: CacheEntry} fetched from started_at on; used by the refresh
+        # scheduler so requests move from the old entries to the new ones
+        # without ever missing. The new entries are hits under the old
+        # interval and the new one alike, so they go in first and only the
+        # interval switch itself holds the lock
+        entries = {
+            cluster_name: self.put(
+                env, cluster_name, entry.result, started_at, notify=False, measured=(entry.size, entry.version)
+            )
+            for cluster_name, entry in fetched.items()
+        }
+
+        if self.store:
+            # Another worker may have refreshed env since; its interval wins
+            interval_start, display_time = self.store.interval(self.name, env, started_at, 0, self.display_time)
+        else:
+            interval_start = started_at
+            display_time = self.display_time() if self.display_time else None
+
+        with self.lock:
+            if interval_start >= self.last_access_time[env]:
+                self.last_access_time[env] = interval_start
+                if self.store or self.display_time:
+                    self.cache_times[env]['display_time'] = display_time
+
+        # Listeners run outside the lock, like for any other put
+        for cluster_name, entry in entries.items():
+            self.notify(env, cluster_name, entry, True)
+
+    def get_display_time(self, env):
+        return self.cache_times[env].get('display_time')
+
+    def set_display_time(self, env, display_time):
+        self.cache_times[env]['display_time'] = display_time
+        if self.store:
+            self.store.set_display_time(self.name, env, display_time)
+
+    def cache_clear(self, env=None):
+        with self.lock:
+            envs = list(self.env_keys.keys()) if env is None else [env]
+            for env_name in envs:
+                for key in self.env_keys.pop(env_name, ()):
+                    self.total_bytes -= self.entries.pop(key).size
+                self.last_access_time.pop(env_name, None)
+                self.cache_times.pop(env_name, None)
+
+            if self.store:
+                self.store.clear(self.name, env)
+
+        if snapshot_persister:
+            snapshot_persister.remove(self.name, env)
+
+    def get_entry(self, env, cluster_name):
+        with self.lock:
+            return self.entries.get((env, cluster_name))
+
+    def describe(self, env, cluster_names, current_time=None):
+        if current_time is None:
+            current_time = time.time()
+
+        stale = False
+        age = 0
+        with self.lock:
+            interval_start = self.last_access_time.get(env, 0)
+            for cluster_name in cluster_names:
+                entry = self.entries.get((env, cluster_name))
+                if not entry:
+                    continue
+                stale = stale or entry.fetched_at < interval_start
+                age = max(age, current_time - entry.fetched_at)
+
+        return {"stale": stale, "age": int(age)}
+
+    def put(self, env, cluster_name, result, fetched_at, publish=True, restored=False, notify=True,
+            only_if_newer=False, measured=None):
+        key = (env, cluster_name)
+        payload = None
+        if measured is None:
+            payload = serialize(result)
+            measured = measure(payload)
+        entry = CacheEntry(result, fetched_at, restored, measured)
+
+        with self.lock:
+            previous = self.entries.get(key)
+            # Snapshots read outside the lock may have been overtaken meanwhile
+            if only_if_newer and previous and previous.fetched_at >= fetched_at:
+                return previous
+
+            if previous:
+                del self.entries[key]
+                self.total_bytes -= previous.size
+
+            self.entries[key] = entry
+            self.env_keys[env].add(key)
+            self.total_bytes += entry.size
+            if publish:
+                observe_payload(self.name, env, entry.size)
+
+            # Least recently used entries go first; the new entry always stays
+            while len(self.entries) > 1 and (
+                len(self.entries) > self.maxsize or self.total_bytes > self.max_bytes
+            ):
+                evicted_key, evicted = self.entries.popitem(last=False)
+                self.env_keys[evicted_key[0]].discard(evicted_key)
+                self.total_bytes -= evicted.size
+                self.counters[evicted_key[0]]["evictions"] += 1
+
+        if publish and self.store:
+            # Entries measured elsewhere are serialized here, only for the store
+            self.store.publish(self.name, env, cluster_name, result, fetched_at, payload or serialize(result))
+
+        if publish and snapshot_persister and (self.persist_if is None or self.persist_if(result)):
+            snapshot_persister.persist(self.name, env, cluster_name, result, fetched_at, measured)
+
+        if notify:
+            self.notify(env, cluster_name, entry, publish)
+        return entry
+
+    def restore(self):
+        if not snapshot_persister:
+            return 0
+
+        restored = 0
+        for env, cluster_name, result, fetched_at, measured in snapshot_persister.load(self.name):
+            local = self.get_entry(env, cluster_name)
+            if local and local.fetched_at >= fetched_at:
+                continue
+            self.put(env, cluster_name, result, fetched_at, publish=False, restored=True, measured=measured)
+            restored += 1
+        return restored
+
+    def call(self, func, cluster_name, env, cache_timestamp):
+        # Every uncached fetch goes through here so it shows up in /metrics
+        return timed_fetch(self.name, env, cluster_name, lambda: func(cluster_name, env, cache_timestamp))
+
+    def put_fetched(self, env, cluster_name, result, fetched_at):
+        # A fetch that reports a failure raises like one that failed outright,
+        # so callers fall back to the entry already cached
+        message = self.failure(result) if self.failure else None
+        if message is not None:
+            raise RuntimeError(message)
+        return self.put(env, cluster_name, result, fetched_at)
+
+    def fetch(self, func, cluster_name, env, cache_timestamp, fetched_at):
+        # Concurrent misses on the same cluster share one fetch
+        return self.flights.do(
+            (env, cluster_name),
+            lambda: self.put_fetched(env, cluster_name, self.call(func, cluster_name, env, cache_timestamp), fetched_at)
+        )
+
+    def revalidate(self, func, cluster_name, env, cache_timestamp):
+        key = (env, cluster_name)
+        flight = self.flights.claim(key)
+        if flight is None:
+            return
+
+        def refresh():
+            try:
+                entry = self.put_fetched(env, cluster_name, self.call(func, cluster_name, env, cache_timestamp), time.time())
+                self.flights.complete(key, flight, result=entry)
+            except Exception as e:
+                print(f"Background refresh of {cluster_name} failed: {e}")
+                self.flights.complete(key, flight, error=e)
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{cluster_name}", daemon=True).start()
+
+    def serves_stale(self, entry, current_time):
+        # Expired entries are served while a background fetch replaces them,
+        # up to CACHE_MAX_STALENESS after which the caller waits again.
+        # Snapshots restored from disk at startup are always served this way
+        age = current_time - entry.fetched_at
+        return (CACHE_STALE_WHILE_REVALIDATE and age < CACHE_MAX_STALENESS) or (
+            entry.restored and age < CACHE_SNAPSHOT_MAX_AGE
+        )
+
+    def is_current(self, env, cluster_name, current_time):
+        # True when the cluster's local entry is from the env's current interval
+        cache_timestamp = self.get_cache_timestamp(env, current_time)
+        with self.lock:
+            self.last_requested[env] = current_time
+            entry = self.entries.get((env, cluster_name))
+            return entry is not None and entry.fetched_at >= cache_timestamp
+
+    def current_entry(self, env, cluster_name, current_time):
+        # Returns (cache_timestamp, entry or None). The shared store is read
+        # outside the cache-wide lock, so a slow SQLite read only holds up the
+        # request that needs it
+        cache_timestamp = self.get_cache_timestamp(env, current_time)
+        with self.lock:
+            self.last_requested[env] = current_time
+            entry = self.entries.get((env, cluster_name))
+
+        if self.store and (not entry or entry.fetched_at < cache_timestamp):
+            entry = self.load_shared(env, cluster_name) or entry
+        return cache_timestamp, entry
+
+    def needs_fetch(self, env, cluster_name, current_time):
+        # True when lookup() would miss, without counting it
+        cache_timestamp, entry = self.current_entry(env, cluster_name, current_time)
+        if not entry:
+            return True
+        return entry.fetched_at < cache_timestamp and not self.serves_stale(entry, current_time)
+
+    def lookup(self, func, cluster_name, env, current_time):
+        # Returns (cache_timestamp, result or None) and does the counting
+        cache_timestamp, entry = self.current_entry(env, cluster_name, current_time)
+        key = (env, cluster_name)
+
+        with self.lock:
+            if entry:
+                if entry.fetched_at >= cache_timestamp:
+                    if key in self.entries:
+                        self.entries.move_to_end(key)
+                    self.counters[env]["hits"] += 1
+                    return cache_timestamp, entry
+
+                if self.serves_stale(entry, current_time):
+                    if key in self.entries:
+                        self.entries.move_to_end(key)
+                    self.counters[env]["stale_hits"] += 1
+                    self.revalidate(func, cluster_name, env, cache_timestamp)
+                    return cache_timestamp, entry
+
+            self.counters[env]["misses"] += 1
+            return cache_timestamp, None
+
+    def load_shared(self, env, cluster_name):
+        # Another worker may already have published this cluster; only a
+        # snapshot newer than the local entry is read and decoded, and its
+        # version is the hash of the stored text rather than a re-serialization
+        local = self.get_entry(env, cluster_name)
+        snapshot = self.store.load(self.name, env, cluster_name, local.fetched_at if local else None)
+        if snapshot is None:
+            return None
+
+        result, fetched_at, payload = snapshot
+        return self.put(
+            env, cluster_name, result, fetched_at, publish=False, only_if_newer=True, measured=measure(payload)
+        )
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "envs": {env: dict(counters) for env, counters in self.counters.items()}
+            }
+
+    def __call__(self, func):
+        def cached_entry(cluster_name, env, timestamp):
+            current_time = time.time()
+            cache_timestamp, entry = self.lookup(func, cluster_name, env, current_time)
+            if entry:
+                return entry
+
+            return self.fetch(func, cluster_name, env, cache_timestamp, current_time)
+
+        @wraps(func)
+        def wrapper(cluster_name, env, timestamp):
+            return cached_entry(cluster_name, env, timestamp).result
+
+        # Callers that need the content version alongside the result use this
+        wrapper.cached_entry = cached_entry
+        return wrapper
+
+def restore_caches():
+    for cache in caches.values():
+        restored = cache.restore()
+        if restored:
+            print(f"Restored {restored} cluster snapshots into the {cache.name} cache")
@@ -0,0 +1,90 @@
+from flask import Blueprint, jsonify, request
+import time
+from datetime import datetime
+from . import platform_dash, custsol_dash
+from .http_cache import make_etag, is_not_modified, not_modified_response, cached_json_response
+
+diff_bp = Blueprint('diff', __name__)
+
+PRODUCT_LINES = {
+    "plt": platform_dash,
+    "cst": custsol_dash
+}
+
+def parse_side(value):
+    # "<product line>:<env type>", e.g. plt:stg
+    line, _, env_type = (value or "").lower().partition(":")
+    module = PRODUCT_LINES.get(line)
+    if module is None or env_type not in module.ENV_TYPES:
+        return None
+    return line, env_type
+
+def diff_versions(from_versions, to_versions):
+    # Hash join on deployment name: one pass over each side
+    changed = []
+    only_in_from = []
+    for microsvc, from_version in from_versions.items():
+        to_version = to_versions.get(microsvc)
+        if to_version is None:
+            only_in_from.append({"microsvc": microsvc, "version": from_version})
+        elif to_version != from_version:
+            changed.append({"microsvc": microsvc, "from": from_version, "to": to_version})
+
+    only_in_to = [
+        {"microsvc": microsvc, "version": to_version}
+        for microsvc, to_version in to_versions.items() if microsvc not in from_versions
+    ]
+
+    return {
+        "changed": sorted(changed, key=lambda item: item["microsvc"]),
+        "only_in_from": sorted(only_in_from, key=lambda item: item["microsvc"]),
+        "only_in_to": sorted(only_in_to, key=lambda item: item["microsvc"])
+    }
+
+@diff_bp.route('/diff', methods=['GET'])
+def get_env_diff():
+    current_date_time = datetime.now().strftime("%d-%m-%Y %I:%M %p")
+    try:
+        from_side = parse_side(request.args.get("from"))
+        to_side = parse_side(request.args.get("to"))
+        if from_side is None or to_side is None:
+            return jsonify({
+                "status": "error",
+                "error": {
+                    "type": "InvalidComparison",
+                    "message": "Use from=<line>:<env>&to=<line>:<env> with line one of " + ", ".join(
+                        f"{line} ({'/'.join(module.ENV_TYPES)})" for line, module in PRODUCT_LINES.items()
+                    )
+                },
+                "date_time": current_date_time
+            }), 400
+
+        current_time = time.time()
+        from_versions, from_snapshots, from_statuses = PRODUCT_LINES[from_side[0]].get_env_type_versions(from_side[1], current_time)
+        to_versions, to_snapshots, to_statuses = PRODUCT_LINES[to_side[0]].get_env_type_versions(to_side[1], current_time)
+
+        etag = make_etag([":".join(from_side), ":".join(to_side)] + from_snapshots + ["|"] + to_snapshots)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+
+        def build_response():
+            differences = diff_versions(from_versions, to_versions)
+            return {
+                "status": "success",
+                "from": ":".join(from_side),
+                "to": ":".join(to_side),
+                "data": differences,
+                "count": sum(len(items) for items in differences.values())
+            }
+
+        return cached_json_response(("diff", (from_side, to_side)), etag, build_response, {
+            "date_time": current_date_time,
+            "clusters": {**from_statuses, **to_statuses}
+        })
+
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e),
+            "date_time": current_date_time
+        }), 500
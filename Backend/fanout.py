@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError
+from .request_timing import in_request_context
+
+CLUSTER_FETCH_CONCURRENCY = int(os.getenv("CLUSTER_FETCH_CONCURRENCY", "8"))
+
+def fan_out(func, items, max_workers=None):
+    # Runs func over items on a bounded worker pool; results keep the order of items
+    items = list(items)
+    if not items:
+        return []
+
+    func = in_request_context(func)
+    workers = min(max_workers or CLUSTER_FETCH_CONCURRENCY, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items))
+
+def fan_out_with_deadline(func, items, timeout, max_workers=None):
+    # Like fan_out, but stops waiting after timeout seconds. Each item gets
+    # (True, result), (True, exception) when func raised, or (False, None)
+    # when it had not finished; unfinished calls complete in the background
+    items = list(items)
+    if not items:
+        return []
+
+    func = in_request_context(func)
+    workers = max(1, min(max_workers or CLUSTER_FETCH_CONCURRENCY, len(items)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(func, item) for item in items]
+        done, _ = wait(futures, timeout=timeout)
+        return [
+            (True, future.exception() or future.result()) if future in done else (False, None)
+            for future in futures
+        ]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fan_out_as_completed(func, items, max_workers=None, timeout=None):
+    # Yields results as soon as each item finishes, in completion order; with
+    # a timeout, items still running after it are dropped
+    items = list(items)
+    if not items:
+        return
+
+    func = in_request_context(func)
+    workers = min(max_workers or CLUSTER_FETCH_CONCURRENCY, len(items))
+    if workers <= 1 and timeout is None:
+        for item in items:
+            yield func(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        futures = [executor.submit(func, item) for item in items]
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                yield future.result()
+        except TimeoutError:
+            return
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,254 @@
+from flask import Blueprint, jsonify, request
+import os
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import insert, text
+from . import db
+from .image_refs import process_container_images
+
+# Only changes are stored: a row per deployment whose version appears,
+# changes or disappears in a cluster, written in batches off the request path
+VERSION_HISTORY = os.getenv("VERSION_HISTORY", "true").lower() == "true"
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "5"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "1000"))
+
+history_bp = Blueprint('history', __name__)
+
+class VersionChange(db.Model):
+    __tablename__ = 'version_history'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    recorded_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    env = db.Column(db.String(64), nullable=False)
+    cluster = db.Column(db.String(128), nullable=False)
+    namespace = db.Column(db.String(128), nullable=False)
+    deployment = db.Column(db.String(255), nullable=False)
+    change = db.Column(db.String(8), nullable=False)
+    version = db.Column(db.String(255), nullable=True)
+    image_tags = db.Column(db.String(1024), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_version_history_env_deployment', 'env', 'deployment', 'recorded_at'),
+        db.Index('ix_version_history_env_cluster', 'env', 'cluster', 'recorded_at'),
+    )
+
+class DeploymentVersion(db.Model):
+    # Latest recorded state per deployment, the baseline new results are diffed against
+    __tablename__ = 'version_history_state'
+    env = db.Column(db.String(64), primary_key=True)
+    cluster = db.Column(db.String(128), primary_key=True)
+    namespace = db.Column(db.String(128), primary_key=True)
+    deployment = db.Column(db.String(255), primary_key=True)
+    version = db.Column(db.String(255), nullable=False)
+    image_tags = db.Column(db.String(1024), nullable=False)
+
+def container_state(containers):
+    return (
+        ",".join(container.get("version", "") for container in containers)[:255],
+        ",".join(container.get("image_tag", "") for container in containers)[:1024]
+    )
+
+def deployment_states(deployments):
+    # From the inventory view of a cluster
+    return {
+        (deployment["namespace"], deployment["deployment-name"]): container_state(deployment.get("main-containers") or [])
+        for deployment in deployments
+    }
+
+def listing_states(deployments_by_namespace):
+    # Same states straight from a deployment listing, for the dashboards
+    # that cache only version strings
+    return {
+        (namespace, deployment["name"]): container_state(process_container_images(deployment["containers"]))
+        for namespace, deployments in deployments_by_namespace
+        for deployment in deployments
+    }
+
+def lock_cluster(env, cluster_name):
+    # Serializes writers from several worker processes on the same cluster
+    if db.engine.dialect.name != "postgresql":
+        return
+    key = int.from_bytes(hashlib.blake2b(f"{env}/{cluster_name}".encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+    db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+
+class HistoryRecorder:
+    def __init__(self):
+        self.app = None
+        self.pending = {}
+        self.recorded = {}
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def enabled(self):
+        return self.app is not None and VERSION_HISTORY
+
+    def record_deployments(self, env, cluster_name, deployments, fetched_at):
+        if self.enabled():
+            self.record(env, cluster_name, deployment_states(deployments), fetched_at)
+
+    def record_listing(self, env, cluster_name, deployments_by_namespace, fetched_at):
+        if self.enabled():
+            self.record(env, cluster_name, listing_states(deployments_by_namespace), fetched_at)
+
+    def record(self, env, cluster_name, states, fetched_at):
+        # Every dashboard refreshing a cluster reports here with the time of
+        # its fetch; unchanged states and fetches older than the last
+        # recorded one are dropped before they reach the database
+        key = (env, cluster_name)
+        fingerprint = hash(frozenset(states.items()))
+        with self.condition:
+            recorded = self.recorded.get(key)
+            if recorded and (recorded[0] == fingerprint or recorded[1] > fetched_at):
+                return
+            self.recorded[key] = (fingerprint, fetched_at)
+            self.pending[key] = (datetime.fromtimestamp(fetched_at, timezone.utc), states)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="history-writer", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+            # Gives the rest of an environment refresh time to land in the same batch
+            time.sleep(HISTORY_FLUSH_SECONDS)
+            with self.condition:
+                pending, self.pending = self.pending, {}
+
+            try:
+                with self.app.app_context():
+                    self.write(pending)
+            except Exception as e:
+                print(f"Failed to record version history: {e}")
+                with self.condition:
+                    for key in pending:
+                        self.recorded.pop(key, None)
+
+    def write(self, pending):
+        changes = []
+        try:
+            for (env, cluster_name), (recorded_at, states) in pending.items():
+                lock_cluster(env, cluster_name)
+                current = {
+                    (state.namespace, state.deployment): state
+                    for state in DeploymentVersion.query.filter_by(env=env, cluster=cluster_name)
+                }
+
+                for (namespace, deployment), (version, image_tags) in states.items():
+                    state = current.pop((namespace, deployment), None)
+                    if state is None:
+                        db.session.add(DeploymentVersion(
+                            env=env,
+                            cluster=cluster_name,
+                            namespace=namespace,
+                            deployment=deployment,
+                            version=version,
+                            image_tags=image_tags
+                        ))
+                        change = "added"
+                    elif (state.version, state.image_tags) != (version, image_tags):
+                        state.version = version
+                        state.image_tags = image_tags
+                        change = "changed"
+                    else:
+                        continue
+
+                    changes.append({
+                        "recorded_at": recorded_at,
+                        "env": env,
+                        "cluster": cluster_name,
+                        "namespace": namespace,
+                        "deployment": deployment,
+                        "change": change,
+                        "version": version,
+                        "image_tags": image_tags
+                    })
+
+                for (namespace, deployment), state in current.items():
+                    db.session.delete(state)
+                    changes.append({
+                        "recorded_at": recorded_at,
+                        "env": env,
+                        "cluster": cluster_name,
+                        "namespace": namespace,
+                        "deployment": deployment,
+                        "change": "removed",
+                        "version": None,
+                        "image_tags": None
+                    })
+
+            for start in range(0, len(changes), HISTORY_BATCH_SIZE):
+                db.session.execute(insert(VersionChange), changes[start:start + HISTORY_BATCH_SIZE])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+history_recorder = HistoryRecorder()
+
+def get_version_timeline(env, deployment, cluster_name=None, namespace=None, since=None, limit=200):
+    query = VersionChange.query.filter_by(env=env, deployment=deployment)
+    if cluster_name:
+        query = query.filter_by(cluster=cluster_name)
+    if namespace:
+        query = query.filter_by(namespace=namespace)
+    if since:
+        query = query.filter(VersionChange.recorded_at >= since)
+
+    changes = query.order_by(VersionChange.recorded_at.desc(), VersionChange.id.desc()).limit(limit).all()
+    return [
+        {
+            "recorded_at": change.recorded_at.isoformat(),
+            "cluster": change.cluster,
+            "namespace": change.namespace,
+            "change": change.change,
+            "version": change.version,
+            "image_tags": change.image_tags
+        }
+        for change in reversed(changes)
+    ]
+
+@history_bp.route('/history/<env>/<deployment>', methods=['GET'])
+def get_deployment_history(env, deployment):
+    current_date_time = datetime.now().strftime("%d-%m-%Y %I:%M %p")
+    try:
+        since = request.args.get("since")
+        timeline = get_version_timeline(
+            env.lower(),
+            deployment,
+            cluster_name=request.args.get("cluster"),
+            namespace=request.args.get("namespace"),
+            since=datetime.fromisoformat(since) if since else None,
+            limit=request.args.get("limit", 200, type=int)
+        )
+
+        return jsonify({
+            "status": "success",
+            "env": env.lower(),
+            "deployment": deployment,
+            "data": timeline,
+            "date_time": current_date_time
+        })
+
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "error": {
+                "type": "InvalidQuery",
+                "message": str(e)
+            },
+            "date_time": current_date_time
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e),
+            "date_time": current_date_time
+        }), 500
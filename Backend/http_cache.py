@@ -0,0 +1,125 @@
+import os
+import json
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import request, Response
+from .request_timing import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "64"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+
+def make_etag(parts):
+    # parts identify the snapshot behind a response: env/cluster names and the
+    # content version of every cached cluster result that went into it
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def is_not_modified(etag):
+    return request.if_none_match.contains_weak(etag)
+
+def not_modified_response(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def with_etag(response, etag):
+    response.set_etag(etag, weak=True)
+    return response
+
+def dumps(payload):
+    # Same key order and trailing newline as jsonify
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) + b"\n"
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8") + b"\n"
+
+class SerializedBody:
+    # The payload serialized once without its closing brace, and its gzip
+    # stream up to a sync point. Fields that change between requests for the
+    # same snapshot (ages, cluster statuses) are appended on every response,
+    # so only those few bytes are serialized and compressed each time
+    __slots__ = ("etag", "head", "empty", "gzip_head", "compressor", "lock")
+
+    def __init__(self, etag, serialized, empty):
+        self.etag = etag
+        self.head = serialized[:-2]
+        self.empty = empty
+        self.gzip_head = None
+        self.compressor = None
+        self.lock = threading.Lock()
+
+    def tail(self, volatile):
+        if not volatile:
+            return b"}\n"
+        fields = dumps(volatile)[1:-2]
+        return (fields if self.empty else b"," + fields) + b"}\n"
+
+    def gzip_body(self, tail):
+        with self.lock:
+            if self.compressor is None:
+                with phase("gzip"):
+                    compressor = zlib.compressobj(RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+                    self.gzip_head = compressor.compress(self.head) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    self.compressor = compressor
+            # A copy carries on the same stream, crc and length included
+            compressor = self.compressor.copy()
+        return self.gzip_head + compressor.compress(tail) + compressor.flush()
+
+    def response(self, volatile=None):
+        tail = self.tail(volatile)
+        if request.accept_encodings.quality("gzip") > 0:
+            response = Response(self.gzip_body(tail), mimetype="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = Response(self.head + tail, mimetype="application/json")
+        response.headers["Vary"] = "Accept-Encoding"
+        return with_etag(response, self.etag)
+
+class ResponseCache:
+    # Keeps the last serialized body per (endpoint, env); a new snapshot
+    # generation shows up as a different etag and replaces it
+    def __init__(self, maxsize=RESPONSE_CACHE_MAX_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, etag):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None or body.etag != etag:
+                return None
+            self.entries.move_to_end(key)
+            return body
+
+    def put(self, key, etag, payload):
+        with phase("serialize"):
+            body = SerializedBody(etag, dumps(payload), not payload)
+        with self.lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return body
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+response_cache = ResponseCache()
+
+def cached_json_response(key, etag, build, volatile=None):
+    # build() returns the payload and only runs when the snapshot changed;
+    # volatile holds the per-request fields, which the etag does not cover
+    body = response_cache.get(key, etag)
+    if body is None:
+        body = response_cache.put(key, etag, build())
+    return body.response(volatile)
@@ -0,0 +1,113 @@
+import os
+import re
+from functools import lru_cache
+from .request_timing import phase
+
+# The fleet runs a small, slowly changing set of image strings, so every
+# distinct image is parsed once per process and looked up afterwards
+IMAGE_PARSE_CACHE_SIZE = int(os.getenv("IMAGE_PARSE_CACHE_SIZE", "8192"))
+
+PLATFORM_SPECIAL_DEPLOYMENTS = ('notary', 'customer-node', 'customer2-node', 'forworder-node')
+
+VERSION_PATTERN = re.compile(r':([^:@]+)(?=[-@]|$)')
+FULL_TAG_PATTERN = re.compile(r':(.+?)(?=@|$)')
+
+@lru_cache(maxsize=IMAGE_PARSE_CACHE_SIZE)
+def parse_image(image):
+    # (image_tag, version), or None when the image has no tag
+    match = VERSION_PATTERN.search(image)
+    if not match:
+        return None
+
+    full_tag = match.group(1)
+    if full_tag.startswith('v'):
+        full_tag = full_tag[1:]
+
+    return full_tag, full_tag.split('-')[0] if '-' in full_tag else full_tag
+
+@lru_cache(maxsize=IMAGE_PARSE_CACHE_SIZE)
+def parse_full_tag(image):
+    # Everything after the tag separator up to the digest, used for the
+    # deployments whose tags carry meaningful suffixes
+    match = FULL_TAG_PATTERN.search(image)
+    if not match:
+        return None
+
+    version = match.group(1)
+    return version[1:] if version.startswith('v') else version
+
+def extract_version_from_image(image_string):
+    parsed = parse_image(image_string)
+    if parsed is None:
+        return {
+            "image_tag": "latest",
+            "version": "latest"
+        }
+
+    return {
+        "image": image_string,
+        "image_tag": parsed[0],
+        "version": parsed[1]
+    }
+
+def process_container_images(containers):
+    # Inventory view: parsed images with duplicate image:version pairs dropped
+    if not containers:
+        return []
+
+    unique_containers = []
+    seen_images = set()
+    for container in containers:
+        processed = extract_version_from_image(container["image"])
+        container_key = f"{container['image']}:{processed['version']}"
+        if container_key not in seen_images:
+            seen_images.add(container_key)
+            unique_containers.append(processed)
+
+    return unique_containers
+
+def get_container_versions(containers, special_deployments=()):
+    # Dashboard view: comma separated versions, "-" when none could be read
+    if not containers:
+        return ""
+
+    versions = []
+    for container in containers:
+        container_name = (container.get("name") or '').lower()
+        if special_deployments and any(dep in container_name for dep in special_deployments):
+            version = parse_full_tag(container["image"])
+        else:
+            parsed = parse_image(container["image"])
+            version = parsed[1] if parsed else None
+
+        if version is not None:
+            versions.append(version)
+
+    return ','.join(versions) if versions else "-"
+
+def build_deployment_versions(deployments_by_namespace, special_deployments=()):
+    # Batch form of get_container_versions over a cluster's deployment list
+    with phase("images"):
+        return [
+            {
+                "deployment_name": deployment["name"],
+                "version": get_container_versions(deployment["containers"], special_deployments)
+            }
+            for _, deployments in deployments_by_namespace
+            for deployment in deployments
+        ]
+
+def build_cluster_info(cluster_name, deployments_by_namespace):
+    # Batch form of process_container_images over a cluster's deployment list
+    with phase("images"):
+        return [
+            {
+                "deployment-name": deployment["name"],
+                "namespace": namespace_name,
+                "cluster": cluster_name,
+                "main-containers": process_container_images(deployment["containers"]),
+                "init-containers": process_container_images(deployment["init_containers"]) if deployment["init_containers"] else [],
+            }
+            for namespace_name, deployments in deployments_by_namespace
+            for deployment in deployments
+        ]
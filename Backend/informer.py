@@ -0,0 +1,224 @@
+import os
+import time
+import threading
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from .k8s_fetch import list_all_deployments, slim_deployment_json, group_by_namespace, K8S_REQUEST_TIMEOUT
+from .client_registry import client_registry
+from .env_cache import CacheEntry
+
+# Keeps one list + watch per cluster so the dashboards read deployments from
+# memory instead of re-listing every cluster when a cache interval expires.
+# Needs tokens that can list and watch deployments across all namespaces.
+DEPLOYMENT_INFORMER = os.getenv("DEPLOYMENT_INFORMER", "false").lower() == "true"
+WATCH_TIMEOUT_SECONDS = int(os.getenv("WATCH_TIMEOUT_SECONDS", "300"))
+WATCH_RETRY_SECONDS = int(os.getenv("WATCH_RETRY_SECONDS", "10"))
+# A cluster whose list + watch keeps failing this long stops being served
+# from its last synced view, so readers fetch it and report the failure
+WATCH_STALE_SECONDS = int(os.getenv("WATCH_STALE_SECONDS", "60"))
+# timeout_seconds is only enforced by the server; a connection dropped
+# silently is given up this long after the server should have closed it
+WATCH_READ_MARGIN_SECONDS = 30
+
+HTTP_GONE = 410
+
+class DeploymentIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deployments = {}
+        self.cluster_keys = {}
+        self.generations = {}
+        self.views = {}
+
+    def replace_cluster(self, cluster_name, deployments):
+        with self.lock:
+            for key in self.cluster_keys.get(cluster_name, ()):
+                self.deployments.pop(key, None)
+
+            keys = set()
+            for deployment in deployments:
+                key = (cluster_name, deployment["namespace"], deployment["name"])
+                self.deployments[key] = deployment
+                keys.add(key)
+
+            self.cluster_keys[cluster_name] = keys
+            self.generations[cluster_name] = self.generations.get(cluster_name, 0) + 1
+
+    def apply_event(self, cluster_name, event_type, deployment):
+        key = (cluster_name, deployment["namespace"], deployment["name"])
+        with self.lock:
+            keys = self.cluster_keys.get(cluster_name)
+            if keys is None:
+                return
+
+            if event_type == "DELETED":
+                if key not in keys:
+                    return
+                keys.discard(key)
+                self.deployments.pop(key, None)
+            elif event_type in ("ADDED", "MODIFIED"):
+                if self.deployments.get(key) == deployment:
+                    return
+                keys.add(key)
+                self.deployments[key] = deployment
+            else:
+                return
+
+            self.generations[cluster_name] += 1
+
+    def drop_cluster(self, cluster_name):
+        with self.lock:
+            for key in self.cluster_keys.pop(cluster_name, ()):
+                self.deployments.pop(key, None)
+            self.generations.pop(cluster_name, None)
+            for view_key in [view_key for view_key in self.views if view_key[0] == cluster_name]:
+                del self.views[view_key]
+
+    def is_synced(self, cluster_name):
+        with self.lock:
+            return cluster_name in self.cluster_keys
+
+    def cluster_view(self, cluster_name, view_name, build):
+        # build() receives [(namespace, [deployments])] and is re-run only
+        # when the cluster changed since the last call for this view; the
+        # result comes back as a CacheEntry so callers also get its version
+        with self.lock:
+            if cluster_name not in self.cluster_keys:
+                return None
+
+            generation = self.generations[cluster_name]
+            cached = self.views.get((cluster_name, view_name))
+            if cached and cached[0] == generation:
+                return cached[1]
+
+            records = [self.deployments[key] for key in self.cluster_keys[cluster_name]]
+
+        value = CacheEntry(
+            build(group_by_namespace(sorted(records, key=lambda d: (d["namespace"], d["name"])))),
+            time.time()
+        )
+
+        with self.lock:
+            if self.generations.get(cluster_name) == generation:
+                self.views[(cluster_name, view_name)] = (generation, value)
+
+        return value
+
+class RawWatch(watch.Watch):
+    # Events are reduced straight from their JSON, skipping model deserialization
+    def get_return_type(self, func):
+        return None
+
+class DeploymentInformer:
+    def __init__(self, cluster_name, connect, index):
+        self.cluster_name = cluster_name
+        self.connect = connect
+        self.index = index
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name=f"deployment-informer-{cluster_name}", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        failing_since = None
+        while not self.stopped.is_set():
+            try:
+                k8s_client = self.connect()
+                if not k8s_client:
+                    raise RuntimeError(f"Could not connect to cluster '{self.cluster_name}'")
+
+                resource_version = self.relist(k8s_client)
+                failing_since = None
+                while not self.stopped.is_set():
+                    resource_version = self.watch(k8s_client, resource_version)
+            except ApiException as e:
+                if e.status == HTTP_GONE:
+                    continue
+                client_registry.invalidate(self.cluster_name, e)
+                print(f"Deployment watch failed for {self.cluster_name}: {e.status} {e.reason}")
+            except Exception as e:
+                client_registry.invalidate(self.cluster_name, e)
+                print(f"Deployment watch failed for {self.cluster_name}: {e}")
+
+            failing_since = failing_since or time.time()
+            if time.time() - failing_since >= WATCH_STALE_SECONDS:
+                self.index.drop_cluster(self.cluster_name)
+            self.stopped.wait(WATCH_RETRY_SECONDS)
+
+    def relist(self, k8s_client):
+        deployments, resource_version = list_all_deployments(k8s_client["apps_v1"])
+        if not self.stopped.is_set():
+            self.index.replace_cluster(self.cluster_name, deployments)
+        return resource_version
+
+    def watch(self, k8s_client, resource_version):
+        # A 410 Gone from here propagates to run(), which lists again
+        watcher = RawWatch()
+        stream = watcher.stream(
+            k8s_client["apps_v1"].list_deployment_for_all_namespaces,
+            resource_version=resource_version,
+            timeout_seconds=WATCH_TIMEOUT_SECONDS,
+            allow_watch_bookmarks=True,
+            _request_timeout=(K8S_REQUEST_TIMEOUT[0], WATCH_TIMEOUT_SECONDS + WATCH_READ_MARGIN_SECONDS)
+        )
+
+        for event in stream:
+            if self.stopped.is_set():
+                watcher.stop()
+                break
+            if not event:
+                continue
+
+            deployment = event.get("raw_object") or {}
+            resource_version = (deployment.get("metadata") or {}).get("resourceVersion") or resource_version
+            if event["type"] in ("ADDED", "MODIFIED", "DELETED"):
+                self.index.apply_event(self.cluster_name, event["type"], slim_deployment_json(deployment))
+
+        return resource_version
+
+class InformerRegistry:
+    def __init__(self, index):
+        self.index = index
+        self.lock = threading.Lock()
+        self.informers = {}
+
+    def ensure(self, cluster_name, connect):
+        with self.lock:
+            if cluster_name in self.informers:
+                return
+            informer = DeploymentInformer(cluster_name, connect, self.index)
+            self.informers[cluster_name] = informer
+        informer.start()
+
+    def stop(self, cluster_names=None):
+        with self.lock:
+            if cluster_names is None:
+                cluster_names = list(self.informers.keys())
+            stopped = [self.informers.pop(name) for name in cluster_names if name in self.informers]
+
+        for informer in stopped:
+            informer.stop()
+            self.index.drop_cluster(informer.cluster_name)
+
+deployment_index = DeploymentIndex()
+deployment_informers = InformerRegistry(deployment_index)
+
+def read_cluster(cluster_name, connect, view_name, build):
+    # Returns None until the informer for the cluster has finished its first list,
+    # and again once it has been failing for WATCH_STALE_SECONDS; callers then
+    # fall back to their regular fetch path
+    if not DEPLOYMENT_INFORMER:
+        return None
+
+    deployment_informers.ensure(cluster_name, connect)
+    return deployment_index.cluster_view(cluster_name, view_name, build)
+
+def stop_informers(cluster_names=None):
+    if DEPLOYMENT_INFORMER:
+        deployment_informers.stop(cluster_names)
@@ -1,412 +1,509 @@
-from flask import Flask,Blueprint, jsonify
-from kubernetes import client
-import urllib3
-import re
-import json
-from flask_cors import CORS
-import os
-import ast
-from functools import wraps
-from collections import defaultdict
-import time
-from datetime import datetime, timezone
-from botocore.exceptions import ClientError
-import boto3
-from dotenv import load_dotenv
-
-load_dotenv()
-
-inventory_bp = Blueprint('inventory', __name__)
-
-app = Flask(__name__, static_folder='public')
-
-CACHE_DURATIONS = ast.literal_eval(os.getenv("CACHE_DURATIONS"))
-CLUSTERS = ast.literal_eval(os.getenv("CLUSTERS"))
-
-k8s_clients = {env: {} for env in CLUSTERS.keys()}
-
-class EnvironmentCache:
-    def __init__(self, maxsize=256):
-        self.maxsize = maxsize
-        self.cache = defaultdict(dict)
-        self.last_access_time = defaultdict(float)
-
-    def get_cache_timestamp(self, env, current_time=None):
-        if current_time is None:
-            current_time = time.time()
-        
-        if not self.last_access_time[env]:
-            self.last_access_time[env] = current_time
-            return current_time
-        
-        time_elapsed = current_time - self.last_access_time[env]
-        duration = CACHE_DURATIONS[env]
-        intervals = int(time_elapsed / duration)
-        
-        return self.last_access_time[env] + (intervals * duration)
-
-    def cache_clear(self, env=None):
-        if env is None:
-            self.cache.clear()
-            self.last_access_time.clear()
-        else:
-            if env in self.cache:
-                del self.cache[env]
-                del self.last_access_time[env]
-
-    def __call__(self, func):
-        @wraps(func)
-        def wrapper(cluster_name, env, timestamp):
-            cache_key = (cluster_name, timestamp)
-            current_time = time.time()
-            cache_timestamp = self.get_cache_timestamp(env, current_time)
-            
-            if current_time > (cache_timestamp + CACHE_DURATIONS[env]):
-                self.cache[env].clear()  
-                self.last_access_time[env] = current_time  
-                cache_timestamp = current_time
-                cache_key = (cluster_name, cache_timestamp)
-            
-            if cache_key in self.cache[env]:
-                return self.cache[env][cache_key]
-            
-            result = func(cluster_name, env, cache_timestamp)
-            self.cache[env][cache_key] = result
-            
-            if len(self.cache[env]) > self.maxsize:
-                oldest_key = min(self.cache[env].keys(), key=lambda k: k[1])
-                self.cache[env].pop(oldest_key)
-            
-            return result
-        return wrapper
-
-cluster_cache = EnvironmentCache(maxsize=int(os.getenv("CACHE_MAX_SIZE")))
-
-def get_short_timezone(zone):
-    words = zone.split()
-    if len(words)==1:
-        short_zone=words
-        return words[0]
-    short_zone = ''.join(word[0] for word in words)
-    return short_zone
-
-def get_formatted_time():
-    local_time = datetime.now().astimezone()
-    zone = local_time.strftime("%Z")
-    short_zone = get_short_timezone(zone)
-    return local_time.strftime(f"%I:%M %p {short_zone}")
-
-def get_formatted_date():
-    local_time = datetime.now().astimezone()
-    return local_time.strftime("%d-%m-%Y")
-
-def get_cluster_credentials(cluster_name, env):
-    secret_name = f"{cluster_name}"
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=os.getenv("AWS_DEFAULT_REGION")
-    )
-    
-    response = client.get_secret_value(SecretId=secret_name)
-    secret = json.loads(response['SecretString'])
-    
-    endpoint = secret.get('cluster_api_endpoint', '')
-    token = secret.get('bearer_token', '')
-    
-    if not endpoint or not token:
-        raise ValueError(f"Cluster credentials not found for {cluster_name} in {env} environment")
-    
-    return {
-        'endpoint': endpoint,
-        'token': token
-    }
-    
-def initialize_k8s_clients(env):
-    clusters = CLUSTERS.get(env, [])
-    
-    for cluster_name in clusters:
-        try:
-            cluster_creds = get_cluster_credentials(cluster_name, env)
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-            if cluster_creds and cluster_creds['endpoint']:
-                if not cluster_creds['endpoint'].startswith('https://'):
-                    continue
-
-                configuration = client.Configuration()
-                configuration.host = cluster_creds['endpoint']
-                configuration.verify_ssl = False
-                configuration.api_key = {"authorization": f"Bearer {cluster_creds['token']}"}
-
-                test_client = client.ApiClient(configuration)
-                test_api = client.CoreV1Api(test_client)
-                test_api.get_api_resources()
-
-                k8s_clients[env][cluster_name] = {
-                    "apps_v1": client.AppsV1Api(test_client),
-                    "core_v1": test_api
-                }
-        except Exception:
-            continue
-
-VERSION_PATTERN = re.compile(r':([^:@]+)(?=[-@]|$)')
-
-def extract_version_from_image(image_string):
-    match = VERSION_PATTERN.search(image_string)
-    if not match:
-        return {
-            "image_tag": "latest", 
-            "version": "latest"
-        }
-    
-    full_tag = match.group(1)
-
-    if full_tag.startswith('v'):
-        full_tag = full_tag[1:]
-    
-    if '-' in full_tag:
-        version = full_tag.split('-')[0]
-        return {
-            "image": image_string,
-            "image_tag": full_tag,
-            "version": version
-        }
-    
-    return {
-        "image": image_string,
-        "image_tag": full_tag,
-        "version": full_tag
-    }
-
-def remove_duplicate_containers(containers_list):
-
-    if not containers_list:
-        return []
-    
-    unique_containers = []
-    seen_images = set()
-    
-    for container in containers_list:
-        container_key = f"{container['image']}:{container['version']}"
-        
-        if container_key not in seen_images:
-            seen_images.add(container_key)
-            unique_containers.append(container)
-    
-    return unique_containers
-
-def process_container_images(containers):
-    if not containers:
-        return []
-    
-    processed_containers = [extract_version_from_image(container.image) for container in containers]
-    
-    return remove_duplicate_containers(processed_containers)
-
-def get_cache_timestamp(env):
-    return cluster_cache.get_cache_timestamp(env)
-
-@cluster_cache
-def get_cluster_info_cached(cluster_name, env, timestamp):
-    return get_cluster_info(cluster_name, env, CACHE_DURATIONS[env], timestamp)
-
-def get_cluster_info(cluster_name, env, cache_duration, cache_timestamp):
-    if cluster_name not in k8s_clients[env]:
-        return {
-            "status": "error",
-            "error": {
-                "type": "ClusterNotFound",
-                "message": f"Cluster '{cluster_name}' not found in {env} environment"
-            }
-        }
-    
-    clients = k8s_clients[env][cluster_name]
-    cluster_info = []
-    
-    fetch_time = get_formatted_time()
-    fetch_date = get_formatted_date()
-    
-    try:
-        namespaces = clients["core_v1"].list_namespace()
-        
-        for ns in namespaces.items:
-            namespace_name = ns.metadata.name
-            deployments = clients["apps_v1"].list_namespaced_deployment(namespace_name)
-            
-            for deployment in deployments.items:
-                main_containers = process_container_images(deployment.spec.template.spec.containers)
-                
-                init_containers = process_container_images(
-                    deployment.spec.template.spec.init_containers
-                ) if deployment.spec.template.spec.init_containers else []
-                
-                deployment_info = {
-                    "deployment-name": deployment.metadata.name,
-                    "namespace": namespace_name,
-                    "cluster": cluster_name,
-                    "main-containers": main_containers,
-                    "init-containers": init_containers,
-                }
-                cluster_info.append(deployment_info)
-        
-        return {
-            "status": "success", 
-            "data": cluster_info, 
-            "time": fetch_time, 
-            "date": fetch_date
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": {
-                "type": "ClusterInfoError",
-                "message": str(e)
-            }
-        }
-
-@inventory_bp.route('/inventory/all-envs', methods=['GET'])
-def get_all_environments():
-    try:
-        environments = list(CLUSTERS.keys())
-        current_date_time = datetime.now().strftime("%d-%m-%Y %I:%M %p")
-        
-        return jsonify({
-            "status": "success",
-            "data": environments,
-            "date_time": current_date_time
-        })
-        
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "error": {
-                "type": "EnvironmentListError",
-                "message": str(e)
-            }
-        }), 500
-
-@inventory_bp.route('/inventory/<env>', methods=['GET'])
-def get_deployments_by_env(env):
-    response_time = get_formatted_time()
-    response_date = get_formatted_date()
-    
-    try:
-        env = env.lower()
-        if env not in CLUSTERS:
-            return jsonify({
-                "status": "error",
-                "error": {
-                    "type": "InvalidEnvironment",
-                    "message": f"Environment '{env}' not supported"
-                },
-                "date_time": f"{response_date} {response_time}"
-            }), 404
-
-        if not k8s_clients.get(env):
-            initialize_k8s_clients(env)
-        
-        if not k8s_clients.get(env):
-            return jsonify({
-                "status": "warning",
-                "message": f"No clusters found for environment: {env}",
-                "data": [],
-                "date_time": f"{response_date} {response_time}"
-            })
-
-        timestamp = get_cache_timestamp(env)
-        all_cluster_details = []
-        
-        for cluster_name in k8s_clients[env].keys():
-            result = get_cluster_info_cached(cluster_name, env, timestamp)
-            if result.get("status") == "success":
-                all_cluster_details.extend(result["data"])
-                response_time = result.get("time", response_time)
-                response_date = result.get("date", response_date)
-        
-        return jsonify({
-            "status": "success",
-            "data": all_cluster_details,
-            "date_time": f"{response_date} {response_time}"
-        })
-            
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "error": {
-                "type": "GeneralException",
-                "message": str(e)
-            },
-            "date_time": f"{response_date} {response_time}"
-        }), 500
-
-@inventory_bp.route('/inventory/cache/refresh/<env>', methods=['POST'])
-def refresh_env_cache(env):
-    response_time = get_formatted_time()
-    response_date = get_formatted_date()
-    try:
-        env = env.lower()
-        if env not in CLUSTERS:
-            return jsonify({
-                "status": "error",
-                "error": {
-                    "type": "InvalidEnvironment",
-                    "message": f"Environment '{env}' not supported"
-                }
-            }), 404
-
-        cluster_cache.cache_clear(env)
-        
-        if env in k8s_clients:
-            k8s_clients[env].clear()
-        
-        initialize_k8s_clients(env)
-
-        timestamp = get_cache_timestamp(env)
-        all_cluster_details = []
-        
-        for cluster_name in k8s_clients[env].keys():
-            result = get_cluster_info_cached(cluster_name, env, timestamp)
-            if result.get("status") == "success":
-                all_cluster_details.extend(result["data"])
-
-        if not all_cluster_details:
-            return jsonify({
-                "status": "warning",
-                "message": f"No data found after refreshing cache for {env} environment",
-                "data": [],
-                "date_time": f"{response_date} {response_time}"
-            })
-
-        return jsonify({
-            "status": "success",
-            "message": f"Cache refreshed for {env} environment",
-            "data": all_cluster_details,
-            "date_time": f"{response_date} {response_time}"
-        })
-
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "error": str(e)
-        }), 500
-
-@inventory_bp.route('/inventory/cache/clear', methods=['POST'])
-def clear_cache():
-    try:
-        cluster_cache.cache_clear()
-        
-        for env in k8s_clients:
-            k8s_clients[env].clear()
-        
-        return jsonify({
-            "status": "success",
-            "message": "Cache cleared successfully",
-            "time": get_formatted_time(),
-            "date": get_formatted_date()
-        })
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "error": str(e)
-        }), 500
+from flask import Flask,Blueprint, jsonify, request, Response
+import json
+from flask_cors import CORS
+import os
+import ast
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from .fanout import fan_out, fan_out_as_completed
+from .cluster_health import ClusterCollection, collect_clusters, capture, circuit_breakers
+from .single_flight import SingleFlight
+from .refresh_scheduler import refresh_scheduler
+from .k8s_fetch import list_deployments_by_namespace, K8S_REQUEST_TIMEOUT
+from .informer import read_cluster, stop_informers
+from .credentials import credential_provider
+from .client_registry import client_registry
+from .env_cache import EnvironmentCache
+from .http_cache import make_etag, is_not_modified, not_modified_response, cached_json_response
+from .search_index import search_index, SEARCH_FIELDS
+from .history import history_recorder
+from .image_refs import build_cluster_info
+from .async_fetch import prefetch_clusters
+
+load_dotenv()
+
+inventory_bp = Blueprint('inventory', __name__)
+
+app = Flask(__name__, static_folder='public')
+
+CACHE_DURATIONS = ast.literal_eval(os.getenv("CACHE_DURATIONS"))
+CLUSTERS = ast.literal_eval(os.getenv("CLUSTERS"))
+
+k8s_clients = {env: {} for env in CLUSTERS.keys()}
+
+refresh_flights = SingleFlight()
+
+def cluster_failure(result):
+    if result.get("status") == "error":
+        return result["error"]["message"]
+    return None
+
+cluster_cache = EnvironmentCache(
+    "inventory",
+    CACHE_DURATIONS,
+    maxsize=int(os.getenv("CACHE_MAX_SIZE")),
+    persist_if=lambda result: result.get("status") == "success",
+    failure=cluster_failure
+)
+
+def get_short_timezone(zone):
+    words = zone.split()
+    if len(words)==1:
+        short_zone=words
+        return words[0]
+    short_zone = ''.join(word[0] for word in words)
+    return short_zone
+
+def get_formatted_time():
+    local_time = datetime.now().astimezone()
+    zone = local_time.strftime("%Z")
+    short_zone = get_short_timezone(zone)
+    return local_time.strftime(f"%I:%M %p {short_zone}")
+
+def get_formatted_date():
+    local_time = datetime.now().astimezone()
+    return local_time.strftime("%d-%m-%Y")
+
+def probe_k8s_cluster(cluster_name):
+    # Clients come from the process-wide registry; raises when the cluster
+    # cannot be reached with its current credentials
+    try:
+        clients = client_registry.get(cluster_name)
+        if not clients:
+            raise ValueError(f"No usable endpoint or token for cluster '{cluster_name}'")
+        clients["core_v1"].get_api_resources(_request_timeout=K8S_REQUEST_TIMEOUT)
+        return clients
+    except Exception as e:
+        client_registry.invalidate(cluster_name, e)
+        raise
+
+def connect_k8s_cluster(cluster_name, env):
+    try:
+        return probe_k8s_cluster(cluster_name)
+    except Exception:
+        return None
+
+def register_k8s_cluster(cluster_name, env):
+    # Clusters are probed once, by the first fetch that needs them, so the
+    # probe runs inside that request's time budget. A failed probe raises
+    # instead of being cached, and the next fetch probes again
+    if cluster_name not in k8s_clients[env]:
+        k8s_clients[env][cluster_name] = probe_k8s_cluster(cluster_name)
+    return k8s_clients[env][cluster_name]
+
+def get_cache_timestamp(env):
+    return cluster_cache.get_cache_timestamp(env)
+
+@cluster_cache
+def get_cluster_info_cached(cluster_name, env, timestamp):
+    return get_cluster_info(cluster_name, env, CACHE_DURATIONS[env], timestamp)
+
+def get_cluster_info(cluster_name, env, cache_duration, cache_timestamp):
+    # Failures raise so they are reported per cluster and its last good
+    # result keeps being served, instead of an error being cached in its place
+    registered = register_k8s_cluster(cluster_name, env)
+    
+    fetch_time = get_formatted_time()
+    fetch_date = get_formatted_date()
+    
+    try:
+        # The registry hands back a rebuilt client once the credentials rotated
+        clients = client_registry.get(cluster_name) or registered
+        cluster_info = build_cluster_info(cluster_name, list_deployments_by_namespace(clients))
+    except Exception as e:
+        client_registry.invalidate(cluster_name, e)
+        raise
+    
+    return {
+        "status": "success", 
+        "data": cluster_info, 
+        "time": fetch_time, 
+        "date": fetch_date
+    }
+
+def get_cluster_info_live(cluster_name, env, timestamp):
+    # Returns the cluster result together with its content version
+    cluster_info = read_cluster(
+        cluster_name,
+        lambda: connect_k8s_cluster(cluster_name, env),
+        "inventory",
+        lambda deployments_by_namespace: build_cluster_info(cluster_name, deployments_by_namespace)
+    )
+    if cluster_info is None:
+        entry = get_cluster_info_cached.cached_entry(cluster_name, env, timestamp)
+        result, version = entry.result, entry.version
+    else:
+        result, version = {
+            "status": "success",
+            "data": cluster_info.result,
+            "time": get_formatted_time(),
+            "date": get_formatted_date()
+        }, cluster_info.version
+        # Informer views never go through the cache, so they are indexed
+        # and recorded here
+        search_index.update_cluster(env, cluster_name, version, result["data"])
+        history_recorder.record_deployments(env, cluster_name, result["data"], cluster_info.fetched_at)
+    
+    return result, version
+
+def cluster_cached(env, cluster_name, entry, fetched):
+    # Every cached result reaches the search index, whoever fetched it;
+    # failed fetches keep the cluster's last indexed deployments searchable.
+    # Snapshots from other workers or from disk were recorded by whoever
+    # fetched them
+    if entry.result.get("status") != "success":
+        return
+    search_index.update_cluster(env, cluster_name, entry.version, entry.result["data"])
+    if fetched:
+        history_recorder.record_deployments(env, cluster_name, entry.result["data"], entry.fetched_at)
+
+cluster_cache.add_listener(cluster_cached)
+
+refresh_scheduler.register(
+    cluster_cache,
+    get_cluster_info_cached.__wrapped__,
+    lambda: list(CLUSTERS.keys()),
+    lambda env: CLUSTERS.get(env, []),
+    failure=cluster_failure
+)
+
+def prefetch_env_cluster_info(env, cluster_names, timeout=None):
+    return prefetch_clusters(
+        cluster_cache,
+        [(env, cluster_name) for cluster_name in cluster_names],
+        lambda env, cluster_name, deployments_by_namespace, fetched_at: {
+            "status": "success",
+            "data": build_cluster_info(cluster_name, deployments_by_namespace),
+            "time": get_formatted_time(),
+            "date": get_formatted_date()
+        },
+        timeout=timeout
+    )
+
+def fetch_env_cluster_info(env, timestamp):
+    # Returns [(result, version) or None] in cluster order and the per-cluster status block
+    credential_provider.prefetch(CLUSTERS[env])
+    return collect_clusters(
+        cluster_cache,
+        [(env, cluster_name) for cluster_name in CLUSTERS[env]],
+        lambda key: get_cluster_info_live(key[1], env, timestamp),
+        failure=cluster_failure,
+        prefetch=lambda keys, timeout: prefetch_env_cluster_info(env, [cluster_name for _, cluster_name in keys], timeout)
+    )
+
+def stream_env_cluster_info(env, timestamp, response_date, response_time):
+    # One JSON object per line; deployments go out cluster by cluster as each
+    # fetch finishes, and a final status line carries the response metadata
+    cluster_names = CLUSTERS[env]
+    credential_provider.prefetch(cluster_names)
+    collection = ClusterCollection(
+        cluster_cache, [(env, cluster_name) for cluster_name in cluster_names], failure=cluster_failure
+    )
+    try:
+        collection.prefetch(lambda keys, timeout: prefetch_env_cluster_info(env, [cluster_name for _, cluster_name in keys], timeout))
+        
+        def emit(served):
+            if served and served[0].get("status") == "success":
+                for deployment in served[0]["data"]:
+                    yield json.dumps(deployment, separators=(",", ":")) + "\n"
+        
+        resolved = set()
+        for key, value in fan_out_as_completed(
+            capture(lambda key: get_cluster_info_live(key[1], env, timestamp)),
+            collection.allowed(),
+            timeout=collection.remaining()
+        ):
+            collection.record(key, value)
+            served = collection.resolve(key)
+            resolved.add(key)
+            yield from emit(served)
+            if served and served[0].get("status") == "success":
+                response_time = served[0].get("time", response_time)
+                response_date = served[0].get("date", response_date)
+        
+        # Skipped, failed and timed out clusters fall back to their last result
+        for key in collection.keys:
+            if key not in resolved:
+                yield from emit(collection.resolve(key))
+        
+        freshness = cluster_cache.describe(env, cluster_names)
+        yield json.dumps({
+            "status": "success",
+            "date_time": f"{response_date} {response_time}",
+            "stale": freshness["stale"],
+            "age": freshness["age"],
+            "clusters": collection.statuses
+        }, separators=(",", ":")) + "\n"
+    except Exception as e:
+        yield json.dumps({
+            "status": "error",
+            "error": {
+                "type": "GeneralException",
+                "message": str(e)
+            },
+            "date_time": f"{response_date} {response_time}"
+        }, separators=(",", ":")) + "\n"
+
+@inventory_bp.route('/inventory/all-envs', methods=['GET'])
+def get_all_environments():
+    try:
+        environments = list(CLUSTERS.keys())
+        current_date_time = datetime.now().strftime("%d-%m-%Y %I:%M %p")
+        
+        return jsonify({
+            "status": "success",
+            "data": environments,
+            "date_time": current_date_time
+        })
+        
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": {
+                "type": "EnvironmentListError",
+                "message": str(e)
+            }
+        }), 500
+
+def index_env(env):
+    if CLUSTERS[env]:
+        fetch_env_cluster_info(env, get_cache_timestamp(env))
+
+def is_index_current(env, indexed_envs, current_time):
+    # The index follows the cache, so an env is current once every cluster
+    # has an entry from the env's current interval
+    return env in indexed_envs and all(
+        cluster_cache.is_current(env, cluster_name, current_time) for cluster_name in CLUSTERS[env]
+    )
+
+@inventory_bp.route('/inventory/search', methods=['GET'])
+def search_deployments():
+    response_time = get_formatted_time()
+    response_date = get_formatted_date()
+    
+    try:
+        criteria = {field: request.args[field] for field in SEARCH_FIELDS if request.args.get(field)}
+        match = request.args.get("match", "exact").lower()
+        if not criteria or match not in ("exact", "prefix"):
+            return jsonify({
+                "status": "error",
+                "error": {
+                    "type": "InvalidQuery",
+                    "message": f"Provide at least one of {', '.join(SEARCH_FIELDS)} and match=exact|prefix"
+                },
+                "date_time": f"{response_date} {response_time}"
+            }), 400
+        
+        envs = [env.strip().lower() for env in request.args.get("env", "").split(",") if env.strip()] or list(CLUSTERS.keys())
+        unknown_envs = [env for env in envs if env not in CLUSTERS]
+        if unknown_envs:
+            return jsonify({
+                "status": "error",
+                "error": {
+                    "type": "InvalidEnvironment",
+                    "message": f"Environment '{unknown_envs[0]}' not supported"
+                },
+                "date_time": f"{response_date} {response_time}"
+            }), 404
+        
+        # Environments that were never loaded, or whose cache interval ran
+        # out, go through the regular cached path first; a search counts as
+        # a request, so the refresh scheduler keeps them current afterwards
+        indexed_envs = set(search_index.indexed_envs())
+        current_time = time.time()
+        outdated_envs = [env for env in envs if not is_index_current(env, indexed_envs, current_time)]
+        if outdated_envs:
+            fan_out(index_env, outdated_envs)
+        
+        limit = request.args.get("limit", type=int)
+        results = search_index.search(criteria, prefix=match == "prefix", envs=set(envs), limit=limit)
+        
+        return jsonify({
+            "status": "success",
+            "data": results,
+            "count": len(results),
+            "date_time": f"{response_date} {response_time}"
+        })
+    
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": {
+                "type": "GeneralException",
+                "message": str(e)
+            },
+            "date_time": f"{response_date} {response_time}"
+        }), 500
+
+@inventory_bp.route('/inventory/<env>', methods=['GET'])
+def get_deployments_by_env(env):
+    response_time = get_formatted_time()
+    response_date = get_formatted_date()
+    
+    try:
+        env = env.lower()
+        if env not in CLUSTERS:
+            return jsonify({
+                "status": "error",
+                "error": {
+                    "type": "InvalidEnvironment",
+                    "message": f"Environment '{env}' not supported"
+                },
+                "date_time": f"{response_date} {response_time}"
+            }), 404
+
+        if not CLUSTERS[env]:
+            return jsonify({
+                "status": "warning",
+                "message": f"No clusters found for environment: {env}",
+                "data": [],
+                "date_time": f"{response_date} {response_time}"
+            })
+
+        timestamp = get_cache_timestamp(env)
+        
+        if request.args.get("format") == "ndjson":
+            return Response(
+                stream_env_cluster_info(env, timestamp, response_date, response_time),
+                mimetype="application/x-ndjson"
+            )
+        
+        cluster_names = CLUSTERS[env]
+        cluster_results, cluster_statuses = fetch_env_cluster_info(env, timestamp)
+        freshness = cluster_cache.describe(env, cluster_names)
+        
+        # Nothing connected and nothing cached to fall back on
+        if not any(cluster_results):
+            return jsonify({
+                "status": "warning",
+                "message": f"No clusters found for environment: {env}",
+                "data": [],
+                "date_time": f"{response_date} {response_time}",
+                "clusters": cluster_statuses
+            })
+        
+        # Cluster statuses go from ok to cached between two polls of the same
+        # snapshot, so they stay out of the etag and the cached body
+        etag = make_etag([env, freshness["stale"]] + [
+            f"{cluster_name}:{served[1] if served else None}"
+            for cluster_name, served in zip(cluster_names, cluster_results)
+        ])
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        date_time = f"{response_date} {response_time}"
+        for served in cluster_results:
+            if served and served[0].get("status") == "success":
+                date_time = f"{served[0].get('date', response_date)} {served[0].get('time', response_time)}"
+        
+        def build_response():
+            all_cluster_details = []
+            for served in cluster_results:
+                if served and served[0].get("status") == "success":
+                    all_cluster_details.extend(served[0]["data"])
+            
+            return {
+                "status": "success",
+                "data": all_cluster_details,
+                "stale": freshness["stale"]
+            }
+        
+        return cached_json_response(("inventory", env), etag, build_response, {
+            "date_time": date_time,
+            "age": freshness["age"],
+            "clusters": cluster_statuses
+        })
+            
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": {
+                "type": "GeneralException",
+                "message": str(e)
+            },
+            "date_time": f"{response_date} {response_time}"
+        }), 500
+
+def refresh_env(env):
+    cluster_cache.cache_clear(env)
+    stop_informers(CLUSTERS[env])
+    circuit_breakers.reset(CLUSTERS[env])
+    search_index.remove(env)
+    
+    # Clusters are probed again by the fetch below
+    if env in k8s_clients:
+        k8s_clients[env].clear()
+
+    timestamp = get_cache_timestamp(env)
+    all_cluster_details = []
+    
+    cluster_results, cluster_statuses = fetch_env_cluster_info(env, timestamp)
+    for served in cluster_results:
+        if served and served[0].get("status") == "success":
+            all_cluster_details.extend(served[0]["data"])
+    
+    return all_cluster_details, cluster_statuses
+
+@inventory_bp.route('/inventory/cache/refresh/<env>', methods=['POST'])
+def refresh_env_cache(env):
+    response_time = get_formatted_time()
+    response_date = get_formatted_date()
+    try:
+        env = env.lower()
+        if env not in CLUSTERS:
+            return jsonify({
+                "status": "error",
+                "error": {
+                    "type": "InvalidEnvironment",
+                    "message": f"Environment '{env}' not supported"
+                }
+            }), 404
+
+        # Refresh requests arriving while one runs for the env share its result
+        all_cluster_details, cluster_statuses = refresh_flights.do(env, lambda: refresh_env(env))
+
+        if not all_cluster_details:
+            return jsonify({
+                "status": "warning",
+                "message": f"No data found after refreshing cache for {env} environment",
+                "data": [],
+                "date_time": f"{response_date} {response_time}"
+            })
+
+        return jsonify({
+            "status": "success",
+            "message": f"Cache refreshed for {env} environment",
+            "data": all_cluster_details,
+            "date_time": f"{response_date} {response_time}",
+            "clusters": cluster_statuses
+        })
+
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 500
+
+@inventory_bp.route('/inventory/cache/clear', methods=['POST'])
+def clear_cache():
+    try:
+        cluster_cache.cache_clear()
+        stop_informers()
+        circuit_breakers.reset()
+        search_index.remove()
+        
+        for env in k8s_clients:
+            k8s_clients[env].clear()
+        
+        return jsonify({
+            "status": "success",
+            "message": "Cache cleared successfully",
+            "time": get_formatted_time(),
+            "date": get_formatted_date()
+        })
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 500
@@ -0,0 +1,188 @@
+import os
+import json
+from collections import defaultdict
+from .metrics import count_api_call
+from .request_timing import phase
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+# "cluster" lists deployments across all namespaces in one call, "namespaced"
+# keeps the per-namespace listing for tokens that cannot list cluster-wide
+DEPLOYMENT_FETCH_MODE = os.getenv("DEPLOYMENT_FETCH_MODE", "cluster").lower()
+DEPLOYMENT_LIST_LIMIT = int(os.getenv("DEPLOYMENT_LIST_LIMIT", "500"))
+
+# "json" parses the raw list response and keeps only the fields we read,
+# "table" asks the server for the kubectl-style Table (no init containers, so
+# only used where those are not needed), "model" uses the client's models
+DEPLOYMENT_LIST_FORMAT = os.getenv("DEPLOYMENT_LIST_FORMAT", "json").lower()
+
+TABLE_ACCEPT = "application/json;as=Table;v=v1;g=meta.k8s.io,application/json"
+
+# (connect, read) seconds for every API server call, so an unreachable
+# cluster fails fast instead of waiting for the OS socket timeout
+K8S_REQUEST_TIMEOUT = (
+    float(os.getenv("K8S_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("K8S_READ_TIMEOUT", "20"))
+)
+
+def slim_containers(containers):
+    if not containers:
+        return []
+    return [{"name": container.name, "image": container.image} for container in containers]
+
+def slim_deployment(deployment):
+    # Only the fields the dashboards read are kept; model objects are dropped
+    pod_spec = deployment.spec.template.spec if deployment.spec and deployment.spec.template else None
+    return {
+        "name": deployment.metadata.name,
+        "namespace": deployment.metadata.namespace,
+        "containers": slim_containers(pod_spec.containers if pod_spec else None),
+        "init_containers": slim_containers(pod_spec.init_containers if pod_spec else None)
+    }
+
+def slim_containers_json(containers):
+    if not containers:
+        return []
+    return [{"name": container.get("name"), "image": container.get("image")} for container in containers]
+
+def slim_deployment_json(item):
+    metadata = item.get("metadata") or {}
+    pod_spec = ((item.get("spec") or {}).get("template") or {}).get("spec") or {}
+    return {
+        "name": metadata.get("name"),
+        "namespace": metadata.get("namespace"),
+        "containers": slim_containers_json(pod_spec.get("containers")),
+        "init_containers": slim_containers_json(pod_spec.get("initContainers"))
+    }
+
+def slim_table_rows(table):
+    columns = [column["name"].lower() for column in table.get("columnDefinitions", [])]
+    name_index = columns.index("name")
+    containers_index = columns.index("containers")
+    images_index = columns.index("images")
+
+    deployments = []
+    for row in table.get("rows", []):
+        cells = row["cells"]
+        metadata = (row.get("object") or {}).get("metadata") or {}
+        names = cells[containers_index].split(",") if cells[containers_index] else []
+        images = cells[images_index].split(",") if cells[images_index] else []
+        deployments.append({
+            "name": metadata.get("name", cells[name_index]),
+            "namespace": metadata.get("namespace"),
+            "containers": [{"name": name, "image": image} for name, image in zip(names, images)],
+            "init_containers": []
+        })
+    return deployments
+
+def list_page_models(apps_v1, namespace, kwargs):
+    if namespace is None:
+        deployments = apps_v1.list_deployment_for_all_namespaces(**kwargs)
+    else:
+        deployments = apps_v1.list_namespaced_deployment(namespace, **kwargs)
+
+    metadata = deployments.metadata
+    return (
+        [slim_deployment(deployment) for deployment in deployments.items],
+        metadata._continue if metadata else None,
+        metadata.resource_version if metadata else None
+    )
+
+def list_page_json(apps_v1, namespace, kwargs):
+    if namespace is None:
+        response = apps_v1.list_deployment_for_all_namespaces(_preload_content=False, **kwargs)
+    else:
+        response = apps_v1.list_namespaced_deployment(namespace, _preload_content=False, **kwargs)
+
+    return parse_list_page(read_response(response))
+
+def list_page_table(apps_v1, namespace, kwargs):
+    query_params = [("includeObject", "Metadata")]
+    if "limit" in kwargs:
+        query_params.append(("limit", kwargs["limit"]))
+    if "_continue" in kwargs:
+        query_params.append(("continue", kwargs["_continue"]))
+
+    path = "/apis/apps/v1/deployments" if namespace is None else f"/apis/apps/v1/namespaces/{namespace}/deployments"
+    response = apps_v1.api_client.call_api(
+        path, "GET",
+        query_params=query_params,
+        header_params={"Accept": TABLE_ACCEPT},
+        auth_settings=["BearerToken"],
+        _return_http_data_only=True,
+        _preload_content=False,
+        _request_timeout=kwargs.get("_request_timeout")
+    )
+
+    return parse_list_page(read_response(response))
+
+def read_response(response):
+    try:
+        return response.data
+    finally:
+        response.release_conn()
+
+def parse_list_page(data):
+    body = loads(data)
+    metadata = body.get("metadata") or {}
+
+    # Servers that cannot produce a Table answer with the regular list
+    if body.get("kind") == "Table":
+        deployments = slim_table_rows(body)
+    else:
+        deployments = [slim_deployment_json(item) for item in body.get("items") or []]
+
+    return deployments, metadata.get("continue"), metadata.get("resourceVersion")
+
+def list_deployments(apps_v1, namespace=None, init_containers=True):
+    if DEPLOYMENT_LIST_FORMAT == "model":
+        list_page = list_page_models
+    elif DEPLOYMENT_LIST_FORMAT == "table" and not init_containers:
+        list_page = list_page_table
+    else:
+        list_page = list_page_json
+
+    items = []
+    continue_token = None
+
+    while True:
+        kwargs = {"_request_timeout": K8S_REQUEST_TIMEOUT}
+        if DEPLOYMENT_LIST_LIMIT > 0:
+            kwargs["limit"] = DEPLOYMENT_LIST_LIMIT
+        if continue_token:
+            kwargs["_continue"] = continue_token
+
+        count_api_call()
+        with phase("deployments"):
+            deployments, continue_token, resource_version = list_page(apps_v1, namespace, kwargs)
+        items.extend(deployments)
+
+        if not continue_token:
+            return items, resource_version
+
+def list_all_deployments(apps_v1, init_containers=True):
+    return list_deployments(apps_v1, None, init_containers)
+
+def list_deployments_by_namespace(k8s_client, init_containers=True):
+    if DEPLOYMENT_FETCH_MODE == "namespaced":
+        count_api_call()
+        with phase("namespaces"):
+            namespaces = k8s_client["core_v1"].list_namespace(_request_timeout=K8S_REQUEST_TIMEOUT)
+        return [
+            (ns.metadata.name, list_deployments(k8s_client["apps_v1"], ns.metadata.name, init_containers)[0])
+            for ns in namespaces.items
+        ]
+
+    deployments, _ = list_all_deployments(k8s_client["apps_v1"], init_containers)
+    return group_by_namespace(deployments)
+
+def group_by_namespace(deployments):
+    grouped = defaultdict(list)
+    for deployment in deployments:
+        grouped[deployment["namespace"]].append(deployment)
+
+    return sorted(grouped.items())
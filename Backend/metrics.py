@@ -0,0 +1,147 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import Blueprint, Response, request, g
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Served at /metrics in the Prometheus text format. Cluster and env labels
+# come from CLUSTERS, so their number is bounded by the configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(9))
+
+metrics_bp = Blueprint('metrics', __name__)
+
+CLUSTER_FETCH_SECONDS = Histogram(
+    "k8s_dashboard_cluster_fetch_seconds", "Time to fetch one cluster from its API server",
+    ["cache", "env", "cluster"], buckets=LATENCY_BUCKETS
+)
+CLUSTER_FETCH_API_CALLS = Histogram(
+    "k8s_dashboard_cluster_fetch_api_calls", "Kubernetes API calls made by one cluster fetch",
+    ["cache", "env"], buckets=(1, 2, 3, 5, 10, 20, 50, 100)
+)
+CLUSTER_FETCH_ERRORS = Counter(
+    "k8s_dashboard_cluster_fetch_errors", "Cluster fetches that failed, by exception type",
+    ["cache", "cluster", "error"]
+)
+CLUSTER_PAYLOAD_BYTES = Histogram(
+    "k8s_dashboard_cluster_payload_bytes", "Serialized size of a freshly fetched cluster result",
+    ["cache", "env"], buckets=SIZE_BUCKETS
+)
+CREDENTIAL_LOOKUP_SECONDS = Histogram(
+    "k8s_dashboard_credential_lookup_seconds", "Secrets Manager lookup latency",
+    ["operation", "outcome"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "k8s_dashboard_http_request_seconds", "Time to answer a request, by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_RESPONSE_BYTES = Histogram(
+    "k8s_dashboard_http_response_bytes", "Response body size, by route",
+    ["route"], buckets=SIZE_BUCKETS
+)
+
+# Holds the API call count of the cluster fetch running in this thread or task
+api_call_counter = ContextVar("api_call_counter", default=None)
+
+def count_api_call():
+    counter = api_call_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+def start_api_count():
+    counter = [0]
+    return counter, api_call_counter.set(counter)
+
+def observe_cluster_fetch(cache_name, env, cluster_name, seconds, api_calls):
+    CLUSTER_FETCH_SECONDS.labels(cache_name, env, cluster_name).observe(seconds)
+    CLUSTER_FETCH_API_CALLS.labels(cache_name, env).observe(api_calls)
+
+def record_fetch_error(cache_name, cluster_name, error):
+    CLUSTER_FETCH_ERRORS.labels(cache_name, cluster_name, type(error).__name__).inc()
+
+def observe_payload(cache_name, env, size):
+    CLUSTER_PAYLOAD_BYTES.labels(cache_name, env).observe(size)
+
+def timed_fetch(cache_name, env, cluster_name, fetch):
+    # Runs fetch() for one cluster, recording its latency and API calls
+    counter, token = start_api_count()
+    started = time.perf_counter()
+    try:
+        return fetch()
+    except Exception as e:
+        record_fetch_error(cache_name, cluster_name, e)
+        raise
+    finally:
+        observe_cluster_fetch(cache_name, env, cluster_name, time.perf_counter() - started, counter[0])
+        api_call_counter.reset(token)
+
+@contextmanager
+def time_credential_lookup(operation):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        CREDENTIAL_LOOKUP_SECONDS.labels(operation, outcome).observe(time.perf_counter() - started)
+
+class CacheCollector:
+    # Reads the counters every EnvironmentCache already keeps at scrape time
+    # instead of adding work to the lookup path
+    def collect(self):
+        from .env_cache import caches
+
+        lookups = CounterMetricFamily(
+            "k8s_dashboard_cache_lookups", "Cache lookups by result", labels=["cache", "env", "result"]
+        )
+        evictions = CounterMetricFamily(
+            "k8s_dashboard_cache_evictions", "Entries evicted to stay within the cache limits", labels=["cache", "env"]
+        )
+        entries = GaugeMetricFamily("k8s_dashboard_cache_entries", "Entries held by the cache", labels=["cache"])
+        size = GaugeMetricFamily("k8s_dashboard_cache_bytes", "Serialized size of the cached entries", labels=["cache"])
+
+        for name, cache in list(caches.items()):
+            stats = cache.stats()
+            entries.add_metric([name], stats["entries"])
+            size.add_metric([name], stats["bytes"])
+            for env, counters in stats["envs"].items():
+                lookups.add_metric([name, env, "hit"], counters["hits"])
+                lookups.add_metric([name, env, "stale_hit"], counters["stale_hits"])
+                lookups.add_metric([name, env, "miss"], counters["misses"])
+                evictions.add_metric([name, env], counters["evictions"])
+
+        yield lookups
+        yield evictions
+        yield entries
+        yield size
+
+REGISTRY.register(CacheCollector())
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def observe_request(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUEST_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+    if not response.is_streamed:
+        HTTP_RESPONSE_BYTES.labels(route).observe(response.calculate_content_length() or 0)
+    return response
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(generate_latest(REGISTRY), content_type=CONTENT_TYPE_LATEST)
+
+def init_app(app):
+    if not METRICS_ENABLED:
+        return
+    app.before_request(start_request_timer)
+    app.after_request(observe_request)
+    app.register_blueprint(metrics_bp)
@@ -0,0 +1,345 @@
+import os
+import re
+import ast
+import json
+import gzip
+import time
+import atexit
+import asyncio
+import threading
+from collections import defaultdict
+from botocore.exceptions import ClientError
+from kubernetes.client.rest import ApiException
+
+# CLUSTER_RECORDING=record appends every Kubernetes list response and
+# Secrets Manager lookup, with how long it took, to CLUSTER_RECORDING_PATH
+# (gzipped JSON lines). CLUSTER_RECORDING=replay serves those recordings
+# instead of the network, waiting the recorded time scaled by
+# CLUSTER_REPLAY_SPEED (0 answers at once). Bearer tokens, container env
+# values and last-applied annotations never reach the file. Watches are not
+# recorded, so informers have nothing to replay. Every recording session
+# starts with the CLUSTERS layout it was made with
+CLUSTER_RECORDING = os.getenv("CLUSTER_RECORDING", "off").lower()
+CLUSTER_RECORDING_PATH = os.getenv("CLUSTER_RECORDING_PATH", "recordings/cluster-responses.jsonl.gz")
+CLUSTER_REPLAY_SPEED = float(os.getenv("CLUSTER_REPLAY_SPEED", "1"))
+
+REDACTED = "REDACTED"
+LAST_APPLIED_ANNOTATION = "kubectl.kubernetes.io/last-applied-configuration"
+JWT_PATTERN = re.compile(r"eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*")
+
+def scrub(value):
+    if isinstance(value, dict):
+        scrubbed = {}
+        for key, item in value.items():
+            if key == LAST_APPLIED_ANNOTATION:
+                scrubbed[key] = REDACTED
+            elif key == "env" and isinstance(item, list):
+                scrubbed[key] = [
+                    dict(scrub(variable), value=REDACTED) if isinstance(variable, dict) and "value" in variable else scrub(variable)
+                    for variable in item
+                ]
+            else:
+                scrubbed[key] = scrub(item)
+        return scrubbed
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    if isinstance(value, str):
+        return JWT_PATTERN.sub(REDACTED, value)
+    return value
+
+def scrub_body(body):
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    try:
+        return json.dumps(scrub(json.loads(body)), separators=(",", ":"))
+    except ValueError:
+        return JWT_PATTERN.sub(REDACTED, body or "")
+
+def scrub_secret(secret_string):
+    # Only what the dashboards read is kept, and never the token itself
+    secret = json.loads(secret_string)
+    return {"cluster_api_endpoint": secret.get("cluster_api_endpoint", ""), "bearer_token": REDACTED}
+
+def request_key(endpoint, path, query, accept):
+    # The threads and asyncio engines ask for the same page in different
+    # shapes; both map to one key so a recording replays under either
+    pairs = query.items() if isinstance(query, dict) else (query or ())
+    return (
+        endpoint.rstrip("/"),
+        path,
+        tuple(sorted((str(key), str(value)) for key, value in pairs)),
+        "table" if accept and "as=Table" in accept else "json"
+    )
+
+def recorded_clusters():
+    try:
+        return ast.literal_eval(os.getenv("CLUSTERS") or "{}")
+    except (ValueError, SyntaxError):
+        return {}
+
+def is_watch(query):
+    pairs = query.items() if isinstance(query, dict) else (query or ())
+    return any(key == "watch" for key, _ in pairs)
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            if self.file is None:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                self.file = gzip.open(self.path, "at", encoding="utf-8")
+                self.file.write(json.dumps({"type": "clusters", "clusters": recorded_clusters()}) + "\n")
+            self.file.write(line)
+            self.file.flush()
+
+    def record_k8s(self, endpoint, path, query, accept, status, reason, body, content_type, elapsed):
+        host, path, query, response_format = request_key(endpoint, path, query, accept)
+        self.write({
+            "type": "k8s",
+            "endpoint": host,
+            "path": path,
+            "query": query,
+            "format": response_format,
+            "status": status,
+            "reason": reason,
+            "content_type": content_type,
+            "body": scrub_body(body),
+            "elapsed": elapsed,
+            "recorded_at": time.time()
+        })
+
+    def record_secret(self, name, secret_string, elapsed, call):
+        self.write({
+            "type": "secret",
+            "name": name,
+            "secret": scrub_secret(secret_string),
+            "call": call,
+            "elapsed": elapsed,
+            "recorded_at": time.time()
+        })
+
+    def record_secret_batch(self, names, elapsed):
+        self.write({"type": "secret_batch", "names": list(names), "elapsed": elapsed, "recorded_at": time.time()})
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+class ReplayResponse:
+    # Enough of RESTResponse / urllib3's HTTPResponse for ApiClient and k8s_fetch
+    def __init__(self, record):
+        self.status = record["status"]
+        self.reason = record.get("reason") or ""
+        self.data = (record.get("body") or "").encode("utf-8")
+        self.headers = {"Content-Type": record.get("content_type") or "application/json"}
+
+    def getheaders(self):
+        return self.headers
+
+    def getheader(self, name, default=None):
+        for key, value in self.headers.items():
+            if key.lower() == name.lower():
+                return value
+        return default
+
+    def release_conn(self):
+        pass
+
+class Player:
+    def __init__(self, path, speed=CLUSTER_REPLAY_SPEED):
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.responses = defaultdict(list)
+        self.secrets = {}
+        self.secret_times = {}
+        self.batch_times = []
+        self.positions = defaultdict(int)
+        self.calls = defaultdict(int)
+        self.clusters = {}
+
+        with gzip.open(path, "rt", encoding="utf-8") as recording:
+            for line in recording:
+                record = json.loads(line)
+                if record["type"] == "k8s":
+                    key = (record["endpoint"], record["path"], tuple(tuple(pair) for pair in record["query"]), record["format"])
+                    self.responses[key].append(record)
+                elif record["type"] == "secret":
+                    self.secrets[record["name"]] = json.dumps(record["secret"])
+                    if record.get("call") == "get":
+                        self.secret_times[record["name"]] = record["elapsed"]
+                elif record["type"] == "secret_batch":
+                    self.batch_times.append(record["elapsed"])
+                elif record["type"] == "clusters":
+                    self.clusters.update(record["clusters"])
+
+    def next(self, key, name):
+        # Repeated requests walk through the recorded answers in order and
+        # keep serving the last one
+        with self.lock:
+            records = self.responses.get(key)
+            if not records:
+                return None
+            position = self.positions[(name, key)]
+            self.positions[(name, key)] = position + 1
+            return records[min(position, len(records) - 1)]
+
+    def count(self, name):
+        with self.lock:
+            self.calls[name] += 1
+
+    def call_counts(self):
+        with self.lock:
+            return dict(self.calls)
+
+    def rewind(self):
+        # Back to the first recorded answer of every request, so repeated
+        # cold runs of a benchmark replay the same sequence
+        with self.lock:
+            self.positions.clear()
+            self.calls.clear()
+
+    def delay(self, elapsed):
+        return max(0.0, (elapsed or 0.0) * self.speed)
+
+    def k8s_record(self, endpoint, path, query, accept):
+        self.count("k8s")
+        record = self.next(request_key(endpoint, path, query, accept), "k8s")
+        if record is None:
+            raise ApiException(status=404, reason=f"No recorded response for {endpoint}{path}")
+        return record
+
+    def serve(self, endpoint, path, query, accept):
+        record = self.k8s_record(endpoint, path, query, accept)
+        time.sleep(self.delay(record["elapsed"]))
+        response = ReplayResponse(record)
+        if not 200 <= response.status <= 299:
+            raise ApiException(http_resp=response)
+        return response
+
+    async def serve_async(self, endpoint, path, query, accept):
+        record = self.k8s_record(endpoint, path, query, accept)
+        await asyncio.sleep(self.delay(record["elapsed"]))
+        if not 200 <= record["status"] <= 299:
+            raise ApiException(status=record["status"], reason=record.get("reason"))
+        return (record.get("body") or "").encode("utf-8")
+
+    def secret(self, name):
+        return self.secrets.get(name)
+
+    def secret_delay(self, name):
+        return self.delay(self.secret_times.get(name, 0.0))
+
+    def batch_delay(self):
+        self.count("batch_get_secret_value")
+        with self.lock:
+            position = self.positions[("secret_batch", None)]
+            self.positions[("secret_batch", None)] = position + 1
+        if not self.batch_times:
+            return 0.0
+        return self.delay(self.batch_times[min(position, len(self.batch_times) - 1)])
+
+recorder = Recorder(CLUSTER_RECORDING_PATH) if CLUSTER_RECORDING == "record" else None
+player = Player(CLUSTER_RECORDING_PATH) if CLUSTER_RECORDING == "replay" else None
+
+if recorder:
+    atexit.register(recorder.close)
+
+def wrap_rest_client(endpoint, rest_client):
+    # Hooks the kubernetes RESTClientObject of one cluster; GET, POST, ...
+    # all end up in its request()
+    if not (recorder or player):
+        return rest_client
+
+    original = rest_client.request
+
+    def request(method, url, query_params=None, headers=None, body=None, post_params=None,
+                _preload_content=True, _request_timeout=None):
+        path = url[len(endpoint.rstrip("/")):] if url.startswith(endpoint.rstrip("/")) else url
+        accept = (headers or {}).get("Accept")
+
+        if player:
+            return player.serve(endpoint, path, query_params, accept)
+
+        started = time.perf_counter()
+        try:
+            response = original(
+                method, url, query_params=query_params, headers=headers, body=body, post_params=post_params,
+                _preload_content=_preload_content, _request_timeout=_request_timeout
+            )
+        except ApiException as e:
+            if method == "GET":
+                recorder.record_k8s(endpoint, path, query_params, accept, e.status, e.reason, e.body, None, time.perf_counter() - started)
+            raise
+
+        if method == "GET" and not is_watch(query_params):
+            # Reading .data keeps it on the response for the caller
+            data = response.data
+            recorder.record_k8s(
+                endpoint, path, query_params, accept, response.status, response.reason, data,
+                response.getheader("Content-Type"), time.perf_counter() - started
+            )
+        return response
+
+    rest_client.request = request
+    return rest_client
+
+class RecordingSecretsClient:
+    def __init__(self, client):
+        self.client = client
+
+    def get_secret_value(self, SecretId):
+        started = time.perf_counter()
+        response = self.client.get_secret_value(SecretId=SecretId)
+        if 'SecretString' in response:
+            recorder.record_secret(SecretId, response['SecretString'], time.perf_counter() - started, "get")
+        return response
+
+    def batch_get_secret_value(self, SecretIdList):
+        started = time.perf_counter()
+        response = self.client.batch_get_secret_value(SecretIdList=SecretIdList)
+        recorder.record_secret_batch(SecretIdList, time.perf_counter() - started)
+        for secret_value in response.get('SecretValues', []):
+            if 'SecretString' in secret_value:
+                recorder.record_secret(secret_value['Name'], secret_value['SecretString'], 0.0, "batch")
+        return response
+
+class ReplaySecretsClient:
+    def get_secret_value(self, SecretId):
+        player.count("get_secret_value")
+        time.sleep(player.secret_delay(SecretId))
+        secret_string = player.secret(SecretId)
+        if secret_string is None:
+            raise ClientError(
+                {"Error": {"Code": "ResourceNotFoundException", "Message": f"No recorded secret {SecretId}"}},
+                "GetSecretValue"
+            )
+        return {"Name": SecretId, "SecretString": secret_string}
+
+    def batch_get_secret_value(self, SecretIdList):
+        time.sleep(player.batch_delay())
+        return {
+            "SecretValues": [
+                {"Name": secret_id, "SecretString": player.secret(secret_id)}
+                for secret_id in SecretIdList if player.secret(secret_id) is not None
+            ],
+            "Errors": [
+                {"SecretId": secret_id, "ErrorCode": "ResourceNotFoundException"}
+                for secret_id in SecretIdList if player.secret(secret_id) is None
+            ]
+        }
+
+def secrets_client(create):
+    # create() builds the real Secrets Manager client; replay never needs it
+    if player:
+        return ReplaySecretsClient()
+    if recorder:
+        return RecordingSecretsClient(create())
+    return create()
@@ -0,0 +1,146 @@
+import os
+import time
+import random
+import threading
+from .fanout import fan_out
+from .cluster_health import circuit_breakers
+from .informer import DEPLOYMENT_INFORMER
+from .env_cache import CacheEntry
+
+# Refreshes every recently requested environment shortly before its cache
+# interval runs out, so requests keep hitting the cache. Informers already
+# keep the dashboards current, so the scheduler stays off alongside them
+REFRESH_SCHEDULER = os.getenv("REFRESH_SCHEDULER", "true").lower() == "true"
+REFRESH_LEAD_SECONDS = float(os.getenv("REFRESH_LEAD_SECONDS", "30"))
+REFRESH_JITTER_SECONDS = float(os.getenv("REFRESH_JITTER_SECONDS", "15"))
+REFRESH_MAX_CONCURRENCY = int(os.getenv("REFRESH_MAX_CONCURRENCY", "4"))
+REFRESH_IDLE_SECONDS = float(os.getenv("REFRESH_IDLE_SECONDS", "1800"))
+REFRESH_TICK_SECONDS = 1.0
+
+class RefreshJob:
+    # fetch(cluster_name, env, timestamp) is the cache's uncached fetch,
+    # envs() lists the environments and clusters(env) their cluster names;
+    # failure(result) flags results that are cached failures
+    def __init__(self, cache, fetch, envs, clusters, failure=None):
+        self.cache = cache
+        self.fetch = fetch
+        self.envs = envs
+        self.clusters = clusters
+        self.failure = failure
+
+class RefreshScheduler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = []
+        self.due_times = {}
+        self.running = set()
+        self.slots = threading.BoundedSemaphore(REFRESH_MAX_CONCURRENCY)
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def register(self, cache, fetch, envs, clusters, failure=None):
+        with self.lock:
+            self.jobs.append(RefreshJob(cache, fetch, envs, clusters, failure))
+
+    def start(self):
+        if not REFRESH_SCHEDULER or DEPLOYMENT_INFORMER:
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name="refresh-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def due_time(self, job, env, interval_start):
+        # Jitter is drawn once per interval so environments sharing a TTL spread out
+        key = (job.cache.name, env, interval_start)
+        due = self.due_times.get(key)
+        if due is None:
+            duration = job.cache.get_duration(env)
+            offset = max(duration - REFRESH_LEAD_SECONDS - random.uniform(0, REFRESH_JITTER_SECONDS), duration / 2)
+            due = self.due_times[key] = interval_start + offset
+        return due
+
+    def run(self):
+        while not self.stopped.wait(REFRESH_TICK_SECONDS):
+            try:
+                self.tick(time.time())
+            except Exception as e:
+                print(f"Refresh scheduler tick failed: {e}")
+
+    def tick(self, current_time):
+        with self.lock:
+            jobs = list(self.jobs)
+            # Intervals that ended long ago can no longer come due
+            for key in [key for key, due in self.due_times.items() if due < current_time - REFRESH_IDLE_SECONDS]:
+                del self.due_times[key]
+
+        for job in jobs:
+            for env in job.envs():
+                interval_start = job.cache.last_access_time.get(env)
+                last_requested = job.cache.last_requested.get(env, 0)
+
+                # Paused until someone asks for the environment again
+                if not interval_start or current_time - last_requested > REFRESH_IDLE_SECONDS:
+                    continue
+                if current_time < self.due_time(job, env, interval_start):
+                    continue
+
+                with self.lock:
+                    if (job.cache.name, env) in self.running:
+                        continue
+                    self.running.add((job.cache.name, env))
+
+                threading.Thread(
+                    target=self.refresh, args=(job, env), name=f"refresh-{job.cache.name}-{env}", daemon=True
+                ).start()
+
+    def refresh_cluster(self, job, env, cluster_name, started_at):
+        # A request missing on the same cluster meanwhile waits for this
+        # fetch, and one already in flight is joined instead of repeated.
+        # The entry is put by begin_interval together with the other clusters
+        with self.slots:
+            entry = job.cache.flights.do(
+                (env, cluster_name),
+                lambda: CacheEntry(job.cache.call(job.fetch, cluster_name, env, started_at), started_at)
+            )
+
+        message = job.failure(entry.result) if job.failure else None
+        if message is not None:
+            raise RuntimeError(message)
+        return entry
+
+    def refresh(self, job, env):
+        try:
+            started_at = time.time()
+            cluster_names = [
+                cluster_name for cluster_name in job.clusters(env) if circuit_breakers.allow(cluster_name, started_at)
+            ]
+
+            def fetch(cluster_name):
+                try:
+                    entry = self.refresh_cluster(job, env, cluster_name, started_at)
+                except Exception as e:
+                    print(f"Scheduled refresh of {cluster_name} failed: {e}")
+                    circuit_breakers.record_failure(cluster_name, str(e) or type(e).__name__)
+                    return cluster_name, None
+                circuit_breakers.record_success(cluster_name)
+                return cluster_name, entry
+
+            # Clusters that failed keep their old entry and are fetched on demand
+            entries = {
+                cluster_name: entry
+                for cluster_name, entry in fan_out(fetch, cluster_names, max_workers=REFRESH_MAX_CONCURRENCY)
+                if entry is not None
+            }
+            job.cache.begin_interval(env, started_at, entries)
+        except Exception as e:
+            print(f"Scheduled refresh of {env} failed: {e}")
+        finally:
+            with self.lock:
+                self.running.discard((job.cache.name, env))
+
+refresh_scheduler = RefreshScheduler()
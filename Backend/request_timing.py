@@ -0,0 +1,211 @@
+import os
+import re
+import sys
+import hmac
+import time
+import heapq
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from flask import request, g
+
+# Every response carries a Server-Timing header with the time the request
+# spent in each phase of the fetch pipeline. Phases running on several
+# worker threads are summed, so they can add up to more than "total"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+
+# The sampling profiler runs for every request with PROFILE_REQUESTS=true,
+# or for a single request sent with an X-Profile header matching
+# PROFILER_TOKEN. Stacks of the request thread and its fan-out workers are
+# sampled every PROFILE_SAMPLE_INTERVAL seconds, and the slowest
+# PROFILE_KEEP_SLOWEST requests are kept in PROFILE_DIR as folded stacks
+# (flamegraph.pl / speedscope input)
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "false").lower() == "true"
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_KEEP_SLOWEST = int(os.getenv("PROFILE_KEEP_SLOWEST", "10"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+current_timing = contextvars.ContextVar("current_timing", default=None)
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.threads = {threading.get_ident()}
+        self.samples = Counter()
+
+    def add(self, name, seconds):
+        with self.lock:
+            total, count = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (total + seconds, count + 1)
+
+    def run_in_thread(self, func, *args):
+        ident = threading.get_ident()
+        with self.lock:
+            self.threads.add(ident)
+        try:
+            return func(*args)
+        finally:
+            with self.lock:
+                self.threads.discard(ident)
+
+    def header(self, total):
+        with self.lock:
+            phases = list(self.phases.items())
+        parts = [
+            f'{name};dur={seconds * 1000:.1f};desc="{count}x"' if count > 1 else f"{name};dur={seconds * 1000:.1f}"
+            for name, (seconds, count) in phases
+        ]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+@contextmanager
+def phase(name):
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - started)
+
+def in_request_context(func):
+    # Worker threads do not inherit context variables; this carries the
+    # request's timing over so phases on the fan-out pool are counted too
+    timing = current_timing.get()
+    if timing is None:
+        return func
+
+    context = contextvars.copy_context()
+
+    def run(*args):
+        return context.copy().run(timing.run_in_thread, func, *args)
+    return run
+
+def folded_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL, keep=PROFILE_KEEP_SLOWEST, directory=PROFILE_DIR):
+        self.interval = interval
+        self.keep = keep
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.active = set()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.slowest = []
+
+    def begin(self, timing):
+        with self.lock:
+            self.active.add(timing)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="request-profiler", daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def end(self, timing):
+        with self.lock:
+            self.active.discard(timing)
+
+    def run(self):
+        # Only wakes up while a profiled request is in progress
+        while True:
+            self.wakeup.wait()
+            with self.lock:
+                active = list(self.active)
+                if not active:
+                    self.wakeup.clear()
+                    continue
+
+            frames = sys._current_frames()
+            for timing in active:
+                with timing.lock:
+                    for ident in timing.threads:
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            timing.samples[folded_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def save(self, timing, duration, route):
+        # Keeps the slowest requests; a faster one than all of them is dropped
+        with self.lock:
+            if len(self.slowest) >= self.keep and duration <= self.slowest[0][0]:
+                return None
+            name = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+            path = os.path.join(self.directory, f"{int(duration * 1000):08d}ms-{name}-{int(time.time() * 1000)}.folded")
+            heapq.heappush(self.slowest, (duration, path))
+            evicted = heapq.heappop(self.slowest)[1] if len(self.slowest) > self.keep else None
+
+        with timing.lock:
+            samples = timing.samples.most_common()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w") as profile:
+                for stack, count in samples:
+                    profile.write(f"{stack} {count}\n")
+            if evicted:
+                os.remove(evicted)
+        except OSError as e:
+            print(f"Failed to write request profile {path}: {e}")
+        return path
+
+profiler = SamplingProfiler()
+
+def wants_profile():
+    if PROFILE_REQUESTS:
+        return True
+    token = request.headers.get("X-Profile")
+    return bool(PROFILER_TOKEN and token and hmac.compare_digest(token, PROFILER_TOKEN))
+
+def start_request():
+    profiled = wants_profile()
+    if not (SERVER_TIMING or profiled):
+        return
+
+    timing = RequestTiming()
+    g.request_timing = timing
+    g.request_profiled = profiled
+    current_timing.set(timing)
+    if profiled:
+        profiler.begin(timing)
+
+def finish_request(response):
+    timing = g.get("request_timing")
+    if timing is None:
+        return response
+
+    total = time.perf_counter() - timing.started
+    if g.get("request_profiled"):
+        profiler.end(timing)
+        path = profiler.save(timing, total, request.url_rule.rule if request.url_rule else request.path)
+        if path:
+            response.headers["X-Profile-File"] = os.path.basename(path)
+
+    # Streamed bodies are produced after the headers went out
+    if SERVER_TIMING and not response.is_streamed:
+        response.headers["Server-Timing"] = timing.header(total)
+    return response
+
+def clear_request(exception=None):
+    timing = g.get("request_timing")
+    if timing is not None and g.get("request_profiled"):
+        profiler.end(timing)
+    current_timing.set(None)
+
+def init_app(app):
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(clear_request)
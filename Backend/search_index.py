@@ -0,0 +1,138 @@
+import bisect
+import threading
+from collections import defaultdict
+
+SEARCH_FIELDS = ("repository", "tag", "version", "deployment", "namespace")
+
+def image_repository(image):
+    # registry:port/path/name:tag@digest -> registry:port/path/name
+    name = image.split("@", 1)[0]
+    slash = name.rfind("/")
+    colon = name.rfind(":")
+    return name[:colon] if colon > slash else name
+
+class SearchIndex:
+    # One document per container image of every indexed deployment, with an
+    # inverted index and a sorted key list per field for exact and prefix lookups
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.next_id = 0
+        self.cluster_documents = {}
+        self.cluster_versions = {}
+        self.postings = {field: defaultdict(set) for field in SEARCH_FIELDS}
+        self.sorted_keys = {field: [] for field in SEARCH_FIELDS}
+
+    def add_posting(self, field, value, document_id):
+        postings = self.postings[field]
+        if value not in postings:
+            bisect.insort(self.sorted_keys[field], value)
+        postings[value].add(document_id)
+
+    def remove_posting(self, field, value, document_id):
+        postings = self.postings[field]
+        documents = postings.get(value)
+        if not documents:
+            return
+        documents.discard(document_id)
+        if not documents:
+            del postings[value]
+            keys = self.sorted_keys[field]
+            position = bisect.bisect_left(keys, value)
+            if position < len(keys) and keys[position] == value:
+                del keys[position]
+
+    def remove_cluster_locked(self, key):
+        for document_id in self.cluster_documents.pop(key, ()):
+            document = self.documents.pop(document_id)
+            for field in SEARCH_FIELDS:
+                self.remove_posting(field, document[field], document_id)
+        self.cluster_versions.pop(key, None)
+
+    def update_cluster(self, env, cluster_name, version, deployments):
+        # Re-indexes a cluster only when its content version changed
+        key = (env, cluster_name)
+        with self.lock:
+            if version is not None and self.cluster_versions.get(key) == version:
+                return
+            self.remove_cluster_locked(key)
+
+            document_ids = []
+            for deployment in deployments:
+                for container_type in ("main-containers", "init-containers"):
+                    for container in deployment.get(container_type) or []:
+                        image = container.get("image", "")
+                        document = {
+                            "env": env,
+                            "cluster": cluster_name,
+                            "namespace": deployment.get("namespace", ""),
+                            "deployment": deployment.get("deployment-name", ""),
+                            "container_type": container_type,
+                            "image": image,
+                            "repository": image_repository(image) if image else "",
+                            "tag": container.get("image_tag", ""),
+                            "version": container.get("version", "")
+                        }
+                        document_id = self.next_id
+                        self.next_id += 1
+                        self.documents[document_id] = document
+                        for field in SEARCH_FIELDS:
+                            self.add_posting(field, document[field], document_id)
+                        document_ids.append(document_id)
+
+            self.cluster_documents[key] = document_ids
+            self.cluster_versions[key] = version
+
+    def remove(self, env=None, cluster_name=None):
+        with self.lock:
+            keys = [
+                key for key in self.cluster_documents
+                if (env is None or key[0] == env) and (cluster_name is None or key[1] == cluster_name)
+            ]
+            for key in keys:
+                self.remove_cluster_locked(key)
+
+    def lookup_locked(self, field, value, prefix):
+        postings = self.postings[field]
+        if not prefix:
+            return set(postings.get(value, ()))
+
+        keys = self.sorted_keys[field]
+        matched = set()
+        position = bisect.bisect_left(keys, value)
+        while position < len(keys) and keys[position].startswith(value):
+            matched.update(postings[keys[position]])
+            position += 1
+        return matched
+
+    def search(self, criteria, prefix=False, envs=None, limit=None):
+        with self.lock:
+            matched = None
+            # Smallest posting sets first keeps the intersection cheap
+            candidates = sorted(
+                (self.lookup_locked(field, value, prefix) for field, value in criteria.items()),
+                key=len
+            )
+            for document_ids in candidates:
+                matched = document_ids if matched is None else matched & document_ids
+                if not matched:
+                    break
+
+            if matched is None:
+                return []
+
+            results = []
+            for document_id in sorted(matched):
+                document = self.documents[document_id]
+                if envs and document["env"] not in envs:
+                    continue
+                results.append(dict(document))
+                if limit and len(results) >= limit:
+                    break
+            return results
+
+    def indexed_envs(self):
+        with self.lock:
+            return sorted({env for env, _ in self.cluster_documents})
+
+search_index = SearchIndex()
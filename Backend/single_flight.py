@@ -0,0 +1,66 @@
+import os
+import threading
+
+# How long a caller waits for a fetch of the same key that someone else started
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "30"))
+
+class Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    # The first caller for a key does the work; callers arriving while it runs
+    # wait for and share its result (or its exception)
+    def __init__(self, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def claim(self, key):
+        # Returns a Flight the caller must complete(), or None when the key is already in flight
+        with self.lock:
+            if key in self.flights:
+                return None
+            flight = self.flights[key] = Flight()
+            return flight
+
+    def complete(self, key, flight, result=None, error=None):
+        flight.result = result
+        flight.error = error
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        flight.done.set()
+
+    def wait(self, key, timeout=None):
+        # Returns the in-flight Flight once it finished, None when nothing is in flight
+        with self.lock:
+            flight = self.flights.get(key)
+        if flight is None:
+            return None
+        if not flight.done.wait(self.timeout if timeout is None else timeout):
+            raise TimeoutError(f"Timed out waiting for the in-flight fetch of {key}")
+        return flight
+
+    def do(self, key, func, timeout=None):
+        while True:
+            flight = self.claim(key)
+            if flight is not None:
+                try:
+                    result = func()
+                except BaseException as e:
+                    self.complete(key, flight, error=e)
+                    raise
+                self.complete(key, flight, result=result)
+                return result
+
+            flight = self.wait(key, timeout)
+            if flight is None:
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
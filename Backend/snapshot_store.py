@@ -0,0 +1,117 @@
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+
+# "memory" keeps every worker's cache private (the default), "sqlite" publishes
+# fetched clusters to a file shared by all worker processes on the host
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_SQLITE_PATH = os.getenv(
+    "CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "release_dash_cache.sqlite3")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    cache TEXT NOT NULL,
+    env TEXT NOT NULL,
+    cluster TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (cache, env, cluster)
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    cache TEXT NOT NULL,
+    env TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    display_time TEXT,
+    PRIMARY KEY (cache, env)
+);
+"""
+
+class SqliteSnapshotStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def load(self, cache, env, cluster_name, newer_than=None):
+        # Returns (result, fetched_at, payload text), or None when there is no
+        # snapshot or none newer than newer_than
+        row = self.connect().execute(
+            "SELECT payload, fetched_at FROM snapshots WHERE cache = ? AND env = ? AND cluster = ? AND fetched_at > ?",
+            (cache, env, cluster_name, newer_than if newer_than is not None else float("-inf"))
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[0]
+
+    def publish(self, cache, env, cluster_name, result, fetched_at, payload=None):
+        # Single upsert, so readers see either the old or the new snapshot; an
+        # older fetch finishing late never replaces a newer one. payload is
+        # result already serialized by the cache, which readers hash as is
+        if payload is None:
+            payload = json.dumps(result, separators=(",", ":"), default=str)
+        self.connect().execute(
+            """
+            INSERT INTO snapshots (cache, env, cluster, fetched_at, payload) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (cache, env, cluster) DO UPDATE
+                SET fetched_at = excluded.fetched_at, payload = excluded.payload
+                WHERE excluded.fetched_at >= snapshots.fetched_at
+            """,
+            (cache, env, cluster_name, fetched_at, payload)
+        )
+
+    def interval(self, cache, env, current_time, duration, display_time=None):
+        # Every worker agrees on when the env's current cache interval started
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT started_at, display_time FROM intervals WHERE cache = ? AND env = ?",
+                (cache, env)
+            ).fetchone()
+            if row and current_time - row[0] < duration:
+                conn.execute("COMMIT")
+                return row[0], row[1]
+
+            new_display_time = display_time() if display_time else None
+            conn.execute(
+                "INSERT OR REPLACE INTO intervals (cache, env, started_at, display_time) VALUES (?, ?, ?, ?)",
+                (cache, env, current_time, new_display_time)
+            )
+            conn.execute("COMMIT")
+            return current_time, new_display_time
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def set_display_time(self, cache, env, display_time):
+        self.connect().execute(
+            "UPDATE intervals SET display_time = ? WHERE cache = ? AND env = ?",
+            (display_time, cache, env)
+        )
+
+    def clear(self, cache, env=None):
+        conn = self.connect()
+        if env is None:
+            conn.execute("DELETE FROM snapshots WHERE cache = ?", (cache,))
+            conn.execute("DELETE FROM intervals WHERE cache = ?", (cache,))
+        else:
+            conn.execute("DELETE FROM snapshots WHERE cache = ? AND env = ?", (cache, env))
+            conn.execute("DELETE FROM intervals WHERE cache = ? AND env = ?", (cache, env))
+
+def create_snapshot_store():
+    if CACHE_BACKEND == "sqlite":
+        return SqliteSnapshotStore(CACHE_SQLITE_PATH)
+    return None
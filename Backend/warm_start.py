@@ -0,0 +1,127 @@
+import os
+import json
+import gzip
+import time
+import threading
+from urllib.parse import quote, unquote
+
+# Last good result of every cluster is kept on disk so a restarted process
+# can answer straight away; unset CACHE_SNAPSHOT_DIR to turn this off
+CACHE_SNAPSHOT_DIR = os.getenv("CACHE_SNAPSHOT_DIR", "")
+CACHE_SNAPSHOT_MAX_AGE = int(os.getenv("CACHE_SNAPSHOT_MAX_AGE", "86400"))
+
+class SnapshotPersister:
+    def __init__(self, directory):
+        self.directory = directory
+        self.pending = {}
+        # Bumped by remove() per cache and per (cache, env); a write taken off
+        # pending before a removal is dropped instead of recreating the file
+        self.generations = {}
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def path(self, cache, env, cluster_name):
+        return os.path.join(self.directory, quote(cache, safe=''), quote(env, safe=''), f"{quote(cluster_name, safe='')}.json.gz")
+
+    def persist(self, cache, env, cluster_name, result, fetched_at, measured=None):
+        # Writes happen on a background thread; only the newest result per cluster is kept.
+        # measured is the cache's (size, version) of result, stored so a restore
+        # does not have to serialize it again
+        with self.condition:
+            self.pending[(cache, env, cluster_name)] = (result, fetched_at, measured, self.generation(cache, env))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="snapshot-writer", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                pending, self.pending = self.pending, {}
+
+            for (cache, env, cluster_name), (result, fetched_at, measured, generation) in pending.items():
+                try:
+                    self.write(self.path(cache, env, cluster_name), result, fetched_at, measured,
+                               lambda: self.generation(cache, env) == generation)
+                except Exception as e:
+                    print(f"Failed to persist snapshot for {cluster_name}: {e}")
+
+    def generation(self, cache, env):
+        return self.generations.get(cache, 0), self.generations.get((cache, env), 0)
+
+    def write(self, path, result, fetched_at, measured=None, current=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        snapshot = {"fetched_at": fetched_at, "result": result}
+        if measured:
+            snapshot["size"], snapshot["version"] = measured
+        payload = json.dumps(snapshot, separators=(",", ":"), default=str)
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=6) as file:
+            file.write(payload)
+
+        # remove() bumps the generation under the same lock before deleting,
+        # so the snapshot is either replaced before that or not at all
+        with self.condition:
+            if current is None or current():
+                os.replace(temp_path, path)
+                return
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def remove(self, cache, env=None):
+        with self.condition:
+            removed = cache if env is None else (cache, env)
+            self.generations[removed] = self.generations.get(removed, 0) + 1
+            for key in [key for key in self.pending if key[0] == cache and (env is None or key[1] == env)]:
+                del self.pending[key]
+
+        cache_dir = os.path.join(self.directory, quote(cache, safe=''))
+        env_dirs = [quote(env, safe='')] if env is not None else (os.listdir(cache_dir) if os.path.isdir(cache_dir) else [])
+        for env_dir in env_dirs:
+            env_path = os.path.join(cache_dir, env_dir)
+            if not os.path.isdir(env_path):
+                continue
+            for file_name in os.listdir(env_path):
+                try:
+                    os.remove(os.path.join(env_path, file_name))
+                except OSError:
+                    pass
+
+    def load(self, cache):
+        cache_dir = os.path.join(self.directory, quote(cache, safe=''))
+        if not os.path.isdir(cache_dir):
+            return
+
+        oldest = time.time() - CACHE_SNAPSHOT_MAX_AGE
+        for env_dir in os.listdir(cache_dir):
+            env_path = os.path.join(cache_dir, env_dir)
+            if not os.path.isdir(env_path):
+                continue
+
+            for file_name in os.listdir(env_path):
+                if not file_name.endswith(".json.gz"):
+                    continue
+                try:
+                    with gzip.open(os.path.join(env_path, file_name), "rt", encoding="utf-8") as file:
+                        snapshot = json.load(file)
+                except Exception as e:
+                    print(f"Skipping unreadable snapshot {file_name}: {e}")
+                    continue
+
+                if snapshot["fetched_at"] < oldest:
+                    continue
+
+                # Snapshots written before size and version were stored get measured again
+                measured = (snapshot["size"], snapshot["version"]) if "version" in snapshot else None
+                cluster_name = unquote(file_name[:-len(".json.gz")])
+                yield unquote(env_dir), cluster_name, snapshot["result"], snapshot["fetched_at"], measured
+
+def create_snapshot_persister():
+    if CACHE_SNAPSHOT_DIR:
+        return SnapshotPersister(CACHE_SNAPSHOT_DIR)
+    return None
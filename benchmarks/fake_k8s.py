@@ -0,0 +1,234 @@
+import os
+import ssl
+import json
+import time
+import random
+import tempfile
+import threading
+import subprocess
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local HTTPS stand-in for the Kubernetes API servers of a synthetic fleet.
+# Every cluster is served under /clusters/<name> and answers only the calls
+# the dashboards make: API discovery, namespace and deployment listing with
+# limit/continue paging. Each request waits latency +/- jitter seconds
+
+SPECIAL_DEPLOYMENTS = ('notary', 'customer-node')
+
+REGISTRIES = (
+    "registry.example.com/platform",
+    "registry.example.com:5000/custsol",
+    "docker.io/library",
+)
+
+def synthetic_image(rng, name, build):
+    registry = rng.choice(REGISTRIES)
+    version = f"{rng.randint(1, 4)}.{rng.randint(0, 30)}.{build}"
+    style = rng.random()
+    if style < 0.2:
+        return f"{registry}/{name}:{version}@sha256:{rng.getrandbits(256):064x}"
+    if style < 0.35:
+        return f"{registry}/{name}:{version}-rc{rng.randint(1, 9)}"
+    return f"{registry}/{name}:{version}"
+
+def synthetic_deployments(cluster_name, namespaces, deployments, containers, init_containers):
+    # Same cluster name, same fleet: runs stay comparable
+    rng = random.Random(cluster_name)
+    items = []
+    for namespace_index in range(namespaces):
+        namespace = f"ns-{namespace_index}"
+        names = [f"svc-{namespace_index}-{index}" for index in range(deployments)]
+        if namespace_index == 0:
+            names = list(SPECIAL_DEPLOYMENTS) + names[len(SPECIAL_DEPLOYMENTS):]
+
+        for name in names:
+            build = rng.randint(1, 400)
+            pod_spec = {
+                "containers": [
+                    {"name": name if index == 0 else f"{name}-sidecar-{index}", "image": synthetic_image(rng, name if index == 0 else "sidecar", build)}
+                    for index in range(containers)
+                ]
+            }
+            if init_containers:
+                pod_spec["initContainers"] = [
+                    {"name": f"{name}-init-{index}", "image": synthetic_image(rng, "init", build)}
+                    for index in range(init_containers)
+                ]
+            items.append({
+                "metadata": {"name": name, "namespace": namespace, "uid": f"{cluster_name}-{namespace}-{name}"},
+                # selector and template labels are required fields of V1DeploymentSpec
+                "spec": {
+                    "replicas": 2,
+                    "selector": {"matchLabels": {"app": name}},
+                    "template": {"metadata": {"labels": {"app": name}}, "spec": pod_spec}
+                },
+                "status": {"replicas": 2, "readyReplicas": 2}
+            })
+    return items
+
+class FakeCluster:
+    def __init__(self, name, namespaces=10, deployments=20, containers=2, init_containers=1, token="bench-token"):
+        self.name = name
+        self.token = token
+        self.items = synthetic_deployments(name, namespaces, deployments, containers, init_containers)
+        self.namespaces = sorted({item["metadata"]["namespace"] for item in self.items})
+        self.encoded = {}
+        self.lock = threading.Lock()
+
+    def encode(self, key, build):
+        # The fake server shares the GIL with the code under test, so every
+        # distinct response is serialized once
+        with self.lock:
+            payload = self.encoded.get(key)
+        if payload is None:
+            payload = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+            with self.lock:
+                self.encoded[key] = payload
+        return payload
+
+    def list_body(self, namespace, limit, offset):
+        items = self.items if namespace is None else [item for item in self.items if item["metadata"]["namespace"] == namespace]
+        end = len(items) if not limit else offset + limit
+        metadata = {"resourceVersion": "1"}
+        if end < len(items):
+            metadata["continue"] = str(end)
+        return {"kind": "DeploymentList", "apiVersion": "apps/v1", "metadata": metadata, "items": items[offset:end]}
+
+    def namespaces_body(self):
+        return {
+            "kind": "NamespaceList",
+            "apiVersion": "v1",
+            "metadata": {"resourceVersion": "1"},
+            "items": [{"metadata": {"name": namespace}} for namespace in self.namespaces]
+        }
+
+def create_certificate(directory):
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key_path, "-out", cert_path],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return cert_path, key_path
+
+class TLSServer(ThreadingHTTPServer):
+    # The handshake runs on the connection's own thread rather than in the
+    # accept loop, and the backlog is deep enough that a burst of new
+    # connections is not dropped and retried a second later
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, handler, context):
+        self.context = context
+        super().__init__(address, handler)
+
+    def finish_request(self, request, client_address):
+        try:
+            connection = self.context.wrap_socket(request, server_side=True)
+        except (ssl.SSLError, OSError):
+            return
+        try:
+            self.RequestHandlerClass(connection, client_address, self)
+        finally:
+            connection.close()
+
+class FakeKubernetesServer:
+    def __init__(self, clusters, latency=0.0, jitter=0.0, host="127.0.0.1"):
+        self.clusters = {cluster.name: cluster for cluster in clusters}
+        self.latency = latency
+        self.jitter = jitter
+        self.host = host
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.server = None
+        self.thread = None
+        self.tempdir = None
+
+    def endpoint(self, cluster_name):
+        return f"https://{self.host}:{self.server.server_port}/clusters/{cluster_name}"
+
+    def count(self, cluster_name):
+        with self.lock:
+            self.requests[cluster_name] = self.requests.get(cluster_name, 0) + 1
+
+    def request_counts(self):
+        with self.lock:
+            return dict(self.requests)
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests.clear()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def start(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        cert_path, key_path = create_certificate(self.tempdir.name)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+
+        self.server = TLSServer((self.host, 0), make_handler(self), context)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-kubernetes", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.tempdir:
+            self.tempdir.cleanup()
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, like a real API server, so connection reuse shows up
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body):
+            payload = body if isinstance(body, bytes) else json.dumps(body, separators=(",", ":")).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            parts = url.path.strip("/").split("/")
+            if len(parts) < 2 or parts[0] != "clusters" or parts[1] not in fake.clusters:
+                return self.send_json(404, {"kind": "Status", "status": "Failure", "reason": "NotFound", "code": 404})
+
+            cluster = fake.clusters[parts[1]]
+            path = "/" + "/".join(parts[2:])
+            fake.count(cluster.name)
+            fake.delay()
+
+            if self.headers.get("Authorization") != f"Bearer {cluster.token}":
+                return self.send_json(401, {"kind": "Status", "status": "Failure", "reason": "Unauthorized", "code": 401})
+
+            query = parse_qs(url.query)
+            limit = int(query.get("limit", ["0"])[0])
+            offset = int(query.get("continue", ["0"])[0])
+
+            if path in ("/api/v1", "/api/v1/"):
+                return self.send_json(200, {"kind": "APIResourceList", "groupVersion": "v1", "resources": []})
+            if path == "/api/v1/namespaces":
+                return self.send_json(200, cluster.encode("namespaces", cluster.namespaces_body))
+            if path == "/apis/apps/v1/deployments":
+                return self.send_json(200, cluster.encode((None, limit, offset), lambda: cluster.list_body(None, limit, offset)))
+            # /clusters/<name>/apis/apps/v1/namespaces/<namespace>/deployments
+            if len(parts) == 8 and path.startswith("/apis/apps/v1/namespaces/") and parts[-1] == "deployments":
+                namespace = parts[6]
+                return self.send_json(
+                    200, cluster.encode((namespace, limit, offset), lambda: cluster.list_body(namespace, limit, offset))
+                )
+            return self.send_json(404, {"kind": "Status", "status": "Failure", "reason": "NotFound", "code": 404})
+
+    return Handler
@@ -0,0 +1,55 @@
+import json
+import time
+import threading
+from botocore.exceptions import ClientError
+
+# Answers the two Secrets Manager calls CredentialProvider makes from memory,
+# with a fixed per-call latency, and counts them
+
+class FakeSecretsManager:
+    def __init__(self, secrets, latency=0.0):
+        self.secrets = secrets
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = {"get_secret_value": 0, "batch_get_secret_value": 0}
+
+    def count(self, operation):
+        with self.lock:
+            self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def call_counts(self):
+        with self.lock:
+            return dict(self.calls)
+
+    def reset_counts(self):
+        with self.lock:
+            for operation in self.calls:
+                self.calls[operation] = 0
+
+    def get_secret_value(self, SecretId):
+        self.count("get_secret_value")
+        if SecretId not in self.secrets:
+            raise ClientError(
+                {"Error": {"Code": "ResourceNotFoundException", "Message": f"Secret {SecretId} not found"}},
+                "GetSecretValue"
+            )
+        return {"Name": SecretId, "SecretString": json.dumps(self.secrets[SecretId])}
+
+    def batch_get_secret_value(self, SecretIdList):
+        self.count("batch_get_secret_value")
+        return {
+            "SecretValues": [
+                {"Name": secret_id, "SecretString": json.dumps(self.secrets[secret_id])}
+                for secret_id in SecretIdList if secret_id in self.secrets
+            ],
+            "Errors": [
+                {"SecretId": secret_id, "ErrorCode": "ResourceNotFoundException"}
+                for secret_id in SecretIdList if secret_id not in self.secrets
+            ]
+        }
+
+def cluster_secret(endpoint, token):
+    # Same keys as the real cluster secrets (see decode_cluster_secret)
+    return {"cluster_api_endpoint": endpoint, "bearer_token": token}
@@ -0,0 +1,462 @@
+import os
+import sys
+import ast
+import gzip
+import json
+import time
+import types
+import argparse
+import platform
+import threading
+import tracemalloc
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+# Measures cold and warm latency, throughput and peak memory of the
+# dashboard endpoints against a synthetic fleet: a local fake Kubernetes API
+# server (fake_k8s.py) and an in-memory Secrets Manager (fake_secrets.py).
+# Requests go through the Flask test client, so no port or proxy is involved.
+#
+#   python benchmarks/run.py                                # default fleet
+#   python benchmarks/run.py --clusters-per-env 10 --latency-ms 80
+#   CLUSTER_FETCH_ENGINE=asyncio python benchmarks/run.py --output new.json
+#   python benchmarks/run.py --compare benchmarks/results/baseline.json
+#   python benchmarks/run.py --replay recordings/      # a CLUSTER_RECORDING=record capture
+#
+# --replay serves a recording of the real fleet at its original timings
+# (scaled by --replay-speed) instead of the fake server and Secrets Manager;
+# the fleet layout comes from the recording, or from CLUSTERS if it has none.
+# Backend settings (CLUSTER_FETCH_ENGINE, DEPLOYMENT_LIST_FORMAT, ...) are read
+# from the environment as usual and recorded with the results. --compare
+# exits with status 1 when a metric got worse than --threshold percent
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, "Backend")
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_k8s import FakeCluster, FakeKubernetesServer
+from fake_secrets import FakeSecretsManager, cluster_secret
+
+RESULTS_VERSION = 1
+RECORDING_FILE = "cluster-responses.jsonl.gz"
+
+ENV_TYPES = {"platform": ("dev", "stg", "prod"), "custsol": ("dev", "stg", "prod")}
+CLUSTER_PREFIXES = {"platform": "plt", "custsol": "cst"}
+
+ENDPOINTS = (
+    ("inventory-env", "/inventory/platform-prod"),
+    ("inventory-search", "/inventory/search?repository=registry.example.com/platform/svc-0&match=prefix"),
+    ("plt-info", "/plt/plt-info"),
+    ("cst-info", "/cst/cst-info"),
+    ("diff", "/diff?from=plt:stg&to=plt:prod"),
+)
+
+# (metric path, True when higher is better)
+COMPARED_METRICS = (
+    (("cold_ms", "median"), False),
+    (("warm_ms", "p50"), False),
+    (("warm_ms", "p95"), False),
+    (("throughput_rps",), True),
+    (("peak_memory_bytes",), False),
+    (("cold_api_requests",), False),
+)
+
+RECORDED_SETTINGS = (
+    "CLUSTER_FETCH_ENGINE", "CLUSTER_FETCH_CONCURRENCY", "DEPLOYMENT_FETCH_MODE", "DEPLOYMENT_LIST_FORMAT",
+    "DEPLOYMENT_LIST_LIMIT", "K8S_POOL_MAXSIZE", "RESPONSE_GZIP_LEVEL", "SERVER_TIMING", "METRICS_ENABLED",
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard endpoints against a synthetic fleet")
+    parser.add_argument("--clusters-per-env", type=int, default=3)
+    parser.add_argument("--namespaces", type=int, default=10)
+    parser.add_argument("--deployments", type=int, default=20, help="deployments per namespace")
+    parser.add_argument("--containers", type=int, default=2, help="containers per deployment")
+    parser.add_argument("--init-containers", type=int, default=1, help="init containers per deployment")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Kubernetes API latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--secrets-latency-ms", type=float, default=30, help="Secrets Manager latency per call")
+    parser.add_argument("--cold-runs", type=int, default=3)
+    parser.add_argument("--warm-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5, help="seconds per throughput run")
+    parser.add_argument("--endpoints", default=",".join(name for name, _ in ENDPOINTS))
+    parser.add_argument("--replay", help=f"recording file, or the directory holding {RECORDING_FILE}, to serve instead of the fake fleet")
+    parser.add_argument("--replay-speed", type=float, default=1, help="scales the recorded timings, 0 answers at once")
+    parser.add_argument("--output", help="results file, default benchmarks/results/<time>-<commit>.json")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed regression in percent")
+    return parser.parse_args()
+
+def fleet_layout(clusters_per_env):
+    return {
+        f"{line}-{env_type}": [f"{CLUSTER_PREFIXES[line]}-{env_type}-{index}" for index in range(1, clusters_per_env + 1)]
+        for line, env_types in ENV_TYPES.items()
+        for env_type in env_types
+    }
+
+def recording_path(replay):
+    return os.path.join(replay, RECORDING_FILE) if os.path.isdir(replay) else replay
+
+def recorded_layout(path):
+    # The first session header of the recording, else the CLUSTERS the
+    # recorded deployment runs with
+    with gzip.open(path, "rt", encoding="utf-8") as recording:
+        for line in recording:
+            record = json.loads(line)
+            if record["type"] == "clusters" and record["clusters"]:
+                return record["clusters"]
+    if os.getenv("CLUSTERS"):
+        return ast.literal_eval(os.environ["CLUSTERS"])
+    sys.exit(f"{path} has no cluster layout; set CLUSTERS to the layout it was recorded with")
+
+def configure_replay(path, speed):
+    os.environ["CLUSTER_RECORDING"] = "replay"
+    os.environ["CLUSTER_RECORDING_PATH"] = path
+    os.environ["CLUSTER_REPLAY_SPEED"] = str(speed)
+
+def configure_environment(layout):
+    os.environ["CLUSTERS"] = repr(layout)
+    os.environ["CACHE_DURATIONS"] = repr({env: 3600 for env in layout})
+    os.environ.setdefault("CACHE_MAX_SIZE", "256")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    # Nothing in the background may touch the caches between measurements
+    os.environ["REFRESH_SCHEDULER"] = "false"
+    os.environ["DEPLOYMENT_INFORMER"] = "false"
+    os.environ["VERSION_HISTORY"] = "false"
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["CACHE_SNAPSHOT_DIR"] = ""
+
+def load_backend():
+    # Backend/__init__.py builds the whole app against Postgres on import.
+    # The dashboards do not need the database, so the package is set up by
+    # hand and only their blueprints are registered
+    from flask import Flask
+    from flask_sqlalchemy import SQLAlchemy
+    from flask_mail import Mail
+
+    package = types.ModuleType("Backend")
+    package.__path__ = [BACKEND_DIR]
+    package.db = SQLAlchemy()
+    package.mail = Mail()
+    sys.modules["Backend"] = package
+
+    from Backend import inventory, platform_dash, custsol_dash, env_diff, metrics, request_timing
+
+    app = Flask("benchmark")
+    app.register_blueprint(inventory.inventory_bp)
+    app.register_blueprint(platform_dash.platform_bp)
+    app.register_blueprint(custsol_dash.custsol_bp)
+    app.register_blueprint(env_diff.diff_bp)
+    metrics.init_app(app)
+    request_timing.init_app(app)
+    return app
+
+def reset_state(app):
+    # Back to a freshly started process: no cached clusters, clients,
+    # credentials, responses or parsed images
+    from Backend.env_cache import caches
+    from Backend.http_cache import response_cache
+    from Backend.client_registry import client_registry
+    from Backend.credentials import credential_provider
+    from Backend.cluster_health import circuit_breakers
+    from Backend.search_index import search_index
+    from Backend.inventory import k8s_clients
+    from Backend import image_refs
+
+    for cache in caches.values():
+        cache.cache_clear()
+        cache.last_requested.clear()
+    response_cache.clear()
+    client_registry.close_all()
+    credential_provider.invalidate()
+    circuit_breakers.reset()
+    search_index.remove()
+    for clients in k8s_clients.values():
+        clients.clear()
+    image_refs.parse_image.cache_clear()
+    image_refs.parse_full_tag.cache_clear()
+
+def timed_get(client, path):
+    started = time.perf_counter()
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    elapsed = time.perf_counter() - started
+
+    body = response.get_data()
+    if response.headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} answered {response.status_code}: {body[:300]!r}")
+    payload = json.loads(body)
+    if payload.get("status") not in (None, "success"):
+        raise RuntimeError(f"{path} failed: {body[:300]!r}")
+    # A partial answer is a success for the dashboards but not a valid timing
+    failed = {
+        cluster_name: status for cluster_name, status in (payload.get("clusters") or {}).items()
+        if status.get("status") not in ("ok", "cached")
+    }
+    if failed:
+        raise RuntimeError(f"{path} answered without {len(failed)} cluster(s): {json.dumps(failed)[:300]}")
+    return elapsed, len(response.get_data())
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+def measure_throughput(app, path, concurrency, duration):
+    counts = [0] * concurrency
+    errors = []
+    deadline = time.perf_counter() + duration
+
+    def worker(slot):
+        client = app.test_client()
+        try:
+            while time.perf_counter() < deadline:
+                timed_get(client, path)
+                counts[slot] += 1
+        except Exception as e:
+            errors.append(e)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if errors:
+        raise errors[0]
+    return sum(counts) / elapsed
+
+class FleetCounters:
+    # Calls that reached the fake Kubernetes API servers and Secrets Manager
+    def __init__(self, fake_k8s, secrets_manager):
+        self.fake_k8s = fake_k8s
+        self.secrets_manager = secrets_manager
+
+    def reset(self):
+        self.fake_k8s.reset_counts()
+        self.secrets_manager.reset_counts()
+
+    def api_requests(self):
+        return sum(self.fake_k8s.request_counts().values())
+
+    def secret_calls(self):
+        return sum(self.secrets_manager.call_counts().values())
+
+class ReplayCounters:
+    # Calls served from the recording; a reset rewinds it as well
+    def __init__(self, player):
+        self.player = player
+
+    def reset(self):
+        self.player.rewind()
+
+    def api_requests(self):
+        return self.player.call_counts().get("k8s", 0)
+
+    def secret_calls(self):
+        counts = self.player.call_counts()
+        return counts.get("get_secret_value", 0) + counts.get("batch_get_secret_value", 0)
+
+def measure_endpoint(app, path, args, counters):
+    client = app.test_client()
+
+    cold = []
+    cold_api_requests = cold_secret_calls = None
+    for _ in range(args.cold_runs):
+        reset_state(app)
+        counters.reset()
+        elapsed, response_bytes = timed_get(client, path)
+        cold.append(elapsed * 1000)
+        if cold_api_requests is None:
+            cold_api_requests = counters.api_requests()
+            cold_secret_calls = counters.secret_calls()
+
+    warm = [timed_get(client, path)[0] * 1000 for _ in range(args.warm_requests)]
+    throughput = measure_throughput(app, path, args.concurrency, args.duration)
+
+    # Allocation tracing slows everything down, so it gets its own cold run
+    reset_state(app)
+    counters.reset()
+    tracemalloc.start()
+    try:
+        timed_get(client, path)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "path": path,
+        "cold_ms": {"median": statistics.median(cold), "min": min(cold), "max": max(cold)},
+        "warm_ms": {"p50": percentile(warm, 0.5), "p95": percentile(warm, 0.95), "mean": statistics.fmean(warm)},
+        "throughput_rps": throughput,
+        "peak_memory_bytes": peak_memory,
+        "response_bytes": response_bytes,
+        "cold_api_requests": cold_api_requests,
+        "cold_secret_calls": cold_secret_calls
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def max_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def metric(results, name, path):
+    value = results["endpoints"].get(name)
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def compare(results, baseline, threshold):
+    if baseline.get("config") != results["config"]:
+        print("warning: the baseline was run with a different configuration")
+
+    regressions = []
+    print(f"\n{'endpoint':<18} {'metric':<20} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in results["endpoints"]:
+        for path, higher_is_better in COMPARED_METRICS:
+            before, after = metric(baseline, name, path), metric(results, name, path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            if flag:
+                regressions.append((name, ".".join(path)))
+            print(f"{name:<18} {'.'.join(path):<20} {before:>12.1f} {after:>12.1f} {change:>+8.1f}%{flag}")
+    return regressions
+
+def print_results(results):
+    print(f"\n{'endpoint':<18} {'cold ms':>9} {'warm p50':>9} {'warm p95':>9} {'req/s':>9} {'peak MiB':>9} {'API calls':>9}")
+    for name, result in results["endpoints"].items():
+        print(
+            f"{name:<18} {result['cold_ms']['median']:>9.1f} {result['warm_ms']['p50']:>9.2f} "
+            f"{result['warm_ms']['p95']:>9.2f} {result['throughput_rps']:>9.1f} "
+            f"{result['peak_memory_bytes'] / 2 ** 20:>9.2f} {result['cold_api_requests']:>9}"
+        )
+
+def fleet_config(args, layout):
+    if args.replay:
+        return {
+            "replay": os.path.abspath(recording_path(args.replay)),
+            "replay_speed": args.replay_speed,
+            "envs": len(layout),
+            "clusters": sum(len(cluster_names) for cluster_names in layout.values())
+        }
+    return {
+        "fleet": {
+            "envs": len(layout),
+            "clusters_per_env": args.clusters_per_env,
+            "namespaces": args.namespaces,
+            "deployments": args.deployments,
+            "containers": args.containers,
+            "init_containers": args.init_containers
+        },
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "secrets_latency_ms": args.secrets_latency_ms
+    }
+
+def start_fleet(args, layout):
+    clusters = [
+        FakeCluster(cluster_name, args.namespaces, args.deployments, args.containers, args.init_containers)
+        for cluster_names in layout.values() for cluster_name in cluster_names
+    ]
+    fake_k8s = FakeKubernetesServer(clusters, args.latency_ms / 1000, args.jitter_ms / 1000).start()
+    secrets_manager = FakeSecretsManager(
+        {cluster.name: cluster_secret(fake_k8s.endpoint(cluster.name), cluster.token) for cluster in clusters},
+        args.secrets_latency_ms / 1000
+    )
+    return fake_k8s, secrets_manager
+
+def main():
+    args = parse_args()
+    selected = set(args.endpoints.split(","))
+    fake_k8s = None
+
+    if args.replay:
+        # Backend.recording replays both the cluster API and Secrets Manager
+        path = recording_path(args.replay)
+        layout = recorded_layout(path)
+        configure_environment(layout)
+        configure_replay(path, args.replay_speed)
+    else:
+        layout = fleet_layout(args.clusters_per_env)
+        configure_environment(layout)
+        fake_k8s, secrets_manager = start_fleet(args, layout)
+
+    try:
+        app = load_backend()
+        if args.replay:
+            from Backend import recording
+            counters = ReplayCounters(recording.player)
+        else:
+            from Backend.credentials import credential_provider
+            credential_provider.get_client = lambda region_name=None: secrets_manager
+            counters = FleetCounters(fake_k8s, secrets_manager)
+
+        results = {
+            "version": RESULTS_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": dict(
+                fleet_config(args, layout),
+                cold_runs=args.cold_runs,
+                warm_requests=args.warm_requests,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                settings={name: os.environ[name] for name in RECORDED_SETTINGS if name in os.environ}
+            ),
+            "endpoints": {}
+        }
+
+        for name, path in ENDPOINTS:
+            if name not in selected:
+                continue
+            print(f"benchmarking {name} ({path})", flush=True)
+            results["endpoints"][name] = measure_endpoint(app, path, args, counters)
+        results["max_rss_bytes"] = max_rss_bytes()
+    finally:
+        if fake_k8s:
+            fake_k8s.stop()
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results",
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['git_commit'] or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+
+    print_results(results)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:g}%")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()